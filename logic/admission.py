@@ -0,0 +1,169 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from .config import (
+    ADMISSION_EXPORT_LIMIT,
+    ADMISSION_EXPORT_QUEUE,
+    ADMISSION_PRIORITY_LOCAL,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_READ_LIMIT,
+    ADMISSION_READ_QUEUE,
+    ADMISSION_WRITE_LIMIT,
+    ADMISSION_WRITE_QUEUE,
+)
+
+# ścieżki zawsze przepuszczane (bez kolejki): sprawdzanie życia, metryki, long-poll (czeka bez zajmowania wątku)
+PRIORITY_PATHS = {"/ping", "/admission", "/notify_reload", "/changes/wait"}
+# ścieżki ciężkie (cała baza lub plik) – osobna, wąska klasa
+EXPORT_PATHS = {("GET", "/export"), ("POST", "/import"), ("POST", "/backup")}
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+# wygładzanie średniego czasu obsługi (do Retry-After)
+_EWMA_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    """Klasa żądań przeciążona – odpowiedź 429 z Retry-After (sekundy)."""
+
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"{lane}: {reason}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Limit współbieżności jednej klasy żądań z ograniczoną kolejką FIFO.
+    Zwolnione miejsce przechodzi od razu na pierwszego czekającego.
+    Metody wołamy w wątku pętli asyncio serwera.
+    """
+
+    def __init__(self, name: str, limit: int, queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit  # 0 = bez limitu
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque = deque()
+        self.service_time = 0.0
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "max_queue": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def retry_after(self) -> int:
+        """Szacowany czas (s) do zwolnienia miejsca: kolejka przed klientem razy średni czas obsługi."""
+        ahead = len(self._waiters) + 1
+        return max(1, math.ceil(ahead * self.service_time / max(1, self.limit)))
+
+    def _reject(self, reason: str):
+        self.stats[f"rejected_{reason}"] += 1
+        raise Rejected(self.name, reason, self.retry_after())
+
+    async def acquire(self):
+        if not self.limit or self.active < self.limit:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.queue:
+            self._reject("queue_full")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.stats["queued"] += 1
+        self.stats["max_queue"] = max(self.stats["max_queue"], len(self._waiters))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # miejsce przyznane w tej samej chwili – oddaj je następnemu
+                self.release()
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("timeout")
+        finally:
+            self.stats["wait_seconds"] += time.monotonic() - started
+        self.stats["admitted"] += 1
+
+    def release(self, seconds: float | None = None):
+        if seconds is not None:
+            self.service_time += _EWMA_ALPHA * (seconds - self.service_time)
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # miejsce przechodzi na czekającego, active bez zmian
+                return
+        self.active -= 1
+
+    def describe(self) -> dict:
+        stats = dict(self.stats)
+        wait_seconds = stats.pop("wait_seconds")
+        return {
+            "limit": self.limit,
+            "queue_limit": self.queue,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            **stats,
+            "avg_wait_ms": round(wait_seconds / stats["queued"] * 1000, 1) if stats["queued"] else 0.0,
+            "avg_service_ms": round(self.service_time * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """
+    Kontrola przyjmowania żądań HTTP w jednym procesie serwera (wszystkie magazyny
+    razem – ograniczeniem jest RPi, nie plik bazy). Klasy: odczyty, zapisy, eksport;
+    każda ma własny limit współbieżności i kolejkę. Po przekroczeniu – 429 z Retry-After
+    zamiast rosnącej kolejki, której klient i tak nie doczeka.
+
+    Pas priorytetowy (bez limitów): PRIORITY_PATHS oraz żądania z tej samej maszyny
+    (GUI, kiosk), gdy ADMISSION_PRIORITY_LOCAL.
+    """
+
+    def __init__(self, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, priority_local: bool = ADMISSION_PRIORITY_LOCAL):
+        self.lanes = {
+            "read": Lane("read", ADMISSION_READ_LIMIT, ADMISSION_READ_QUEUE, queue_timeout),
+            "write": Lane("write", ADMISSION_WRITE_LIMIT, ADMISSION_WRITE_QUEUE, queue_timeout),
+            "export": Lane("export", ADMISSION_EXPORT_LIMIT, ADMISSION_EXPORT_QUEUE, queue_timeout),
+        }
+        self.priority_local = priority_local
+        self.priority = 0
+
+    def classify(self, method: str, path: str, client_host: str | None) -> str | None:
+        """Klasa żądania; None = pas priorytetowy."""
+        if path.startswith("/inventories/"):
+            # /inventories/{nazwa}/items -> /items (ta sama klasa co w domyślnym magazynie)
+            rest = path[len("/inventories/"):]
+            path = rest[rest.find("/"):] if "/" in rest else "/inventories"
+        if path in PRIORITY_PATHS or (self.priority_local and client_host in LOCAL_HOSTS):
+            return None
+        if (method, path) in EXPORT_PATHS:
+            return "export"
+        if method in ("GET", "HEAD", "OPTIONS"):
+            return "read"
+        return "write"
+
+    async def run(self, lane_name: str | None, call):
+        """Wykonuje `call()` w limicie klasy; Rejected, gdy klasa jest przeciążona."""
+        if lane_name is None:
+            self.priority += 1
+            return await call()
+        lane = self.lanes[lane_name]
+        await lane.acquire()
+        started = time.monotonic()
+        try:
+            return await call()
+        finally:
+            lane.release(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {"priority": self.priority, "lanes": {name: lane.describe() for name, lane in self.lanes.items()}}
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from .config import BACKUP_KEEP, BACKUP_PAGES_PER_STEP, BACKUP_STEP_SLEEP_MS
+
+BACKUP_PREFIX = "inventory-"
+BACKUP_SUFFIX = ".db"
+
+
+class BackupCancelled(Exception):
+    """Kopia przerwana – niedokończony plik jest usuwany, poprzednie kopie zostają."""
+
+
+class BackupError(Exception):
+    """Kopia nie przeszła sprawdzenia integralności."""
+
+
+def list_backups(target_dir: Path, prefix: str = BACKUP_PREFIX) -> list[Path]:
+    """Kopie w katalogu, od najstarszej (nazwa zawiera datę i godzinę)."""
+    target_dir = Path(target_dir)
+    if not target_dir.is_dir():
+        return []
+    # dokładny wzorzec daty – kopie innych magazynów (inny prefiks) nie są liczone
+    pattern = f"{prefix}{'[0-9]' * 8}-{'[0-9]' * 6}{BACKUP_SUFFIX}"
+    return sorted(p for p in target_dir.glob(pattern) if p.is_file())
+
+
+def rotate_backups(target_dir: Path, keep: int = BACKUP_KEEP, prefix: str = BACKUP_PREFIX) -> list[Path]:
+    """Usuwa najstarsze kopie ponad `keep`; zwraca usunięte ścieżki."""
+    backups = list_backups(target_dir, prefix)
+    removed = backups[:-keep] if keep > 0 else []
+    for path in removed:
+        try:
+            path.unlink()
+        except OSError as e:
+            print("Nie udało się usunąć starej kopii:", path, e)
+    return removed
+
+
+def backup_database(db, target_dir: Path, pages: int = BACKUP_PAGES_PER_STEP,
+                    keep: int = BACKUP_KEEP, progress=None, cancel_event=None,
+                    prefix: str = BACKUP_PREFIX) -> dict:
+    """
+    Kopia bazy przez API backup SQLite: `pages` stron na krok, między
+    krokami baza jest zwalniana, więc odczyty i zapisy serwera/GUI idą dalej.
+    Zapis z innego połączenia (każdy zapis Database ma własne) zaczyna kopiowanie
+    od pierwszej strony, więc przy ciągłych zapisach kopia trwa dłużej.
+    Kopia powstaje w pliku tymczasowym, jest sprawdzana PRAGMA integrity_check
+    i dopiero wtedy dostaje docelową nazwę; potem rotacja starszych kopii.
+
+    progress(copied_pages, total_pages) wołane po każdym kroku,
+    cancel_event (threading.Event) sprawdzane między krokami.
+    """
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    name = f"{prefix}{time.strftime('%Y%m%d-%H%M%S')}{BACKUP_SUFFIX}"
+    output_path = target_dir / name
+    tmp_path = target_dir / f".{name}.{os.getpid()}.tmp"
+
+    def on_step(status, remaining, total):
+        if cancel_event is not None and cancel_event.is_set():
+            raise BackupCancelled()
+        if progress is not None:
+            progress(total - remaining, total)
+
+    started = time.monotonic()
+    src = db._get_conn()
+    dst = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        src.backup(dst, pages=pages, progress=on_step, sleep=BACKUP_STEP_SLEEP_MS / 1000)
+        # jeden samodzielny plik na pendrive (bez -wal/-shm)
+        dst.execute("PRAGMA journal_mode = DELETE")
+        result = dst.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise BackupError(f"Kopia uszkodzona: {result}")
+        page_count = dst.execute("PRAGMA page_count").fetchone()[0]
+        dst.close()
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        dst.close()
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+    finally:
+        src.close()
+
+    removed = rotate_backups(target_dir, keep, prefix)
+    return {
+        "path": str(output_path),
+        "pages": page_count,
+        "bytes": output_path.stat().st_size,
+        "integrity": "ok",
+        "seconds": round(time.monotonic() - started, 3),
+        "removed": [str(p) for p in removed],
+    }
@@ -0,0 +1,104 @@
+import asyncio
+
+from .config import WS_COALESCE_MS, WS_COALESCE_MAX_DELAY_MS
+
+
+def merge_events(events: list[dict]) -> dict:
+    """Łączy kilka zdarzeń o zmianach w jedną wiadomość RELOAD z listą zmian."""
+    ops: dict = {}
+    full = False
+    for event in events:
+        item_id = event.get("id")
+        op = event.get("op")
+        if item_id is None:
+            # zmiana bez id (np. /notify_reload bez treści) -> klient przeładowuje całość
+            full = True
+            continue
+        # add + update w jednym oknie to nadal "add"
+        if not (ops.get(item_id) == "add" and op == "update"):
+            ops[item_id] = op
+    message = {"event": "reload", "changes": [{"op": op, "id": item_id} for item_id, op in ops.items()]}
+    seqs = [e["seq"] for e in events if isinstance(e.get("seq"), int)]
+    if seqs:
+        message["seq"] = max(seqs)
+    if full:
+        message["full"] = True
+    # identyfikatory śladów – klient odsyła je w potwierdzeniu po przeładowaniu widoku
+    traces = list(dict.fromkeys(e["trace"]["id"] for e in events if isinstance(e.get("trace"), dict)))
+    if traces:
+        message["traces"] = traces
+    # kategorie (przed i po zmianie) każdego wpisu – do filtrów subskrypcji, nie trafiają do klientów;
+    # None = kategoria nieznana (zdarzenie z innego procesu), wtedy zmianę dostają wszyscy
+    routing: dict = {}
+    for event in events:
+        item_id = event.get("id")
+        if item_id is None:
+            continue
+        category_ids = event.get("category_ids")
+        if category_ids is None or (item_id in routing and routing[item_id] is None):
+            routing[item_id] = None
+        else:
+            routing[item_id] = routing.get(item_id, set()) | set(category_ids)
+    message["routing"] = routing
+    # ślady każdego wpisu – klient z filtrem dostaje (i potwierdza) tylko ślady zmian, które do niego trafiły
+    traces_by_id: dict = {}
+    for event in events:
+        if event.get("id") is not None and isinstance(event.get("trace"), dict):
+            traces_by_id.setdefault(event["id"], []).append(event["trace"]["id"])
+    message["traces_by_id"] = traces_by_id
+    origins = {e.get("origin") for e in events}
+    if len(origins) == 1 and None not in origins:
+        message["origin"] = origins.pop()
+    return message
+
+
+class ChangeBroadcaster:
+    """
+    Okno łączenia zdarzeń: zmiany, które przyjdą w ciągu `window_ms`, trafiają
+    do klientów jedną wiadomością. Okno przesuwa się z każdą zmianą, ale żadna
+    zmiana nie czeka dłużej niż `max_delay_ms` od pierwszej w paczce.
+    Metody wołamy w wątku pętli asyncio serwera.
+    """
+
+    def __init__(self, send, window_ms: int = WS_COALESCE_MS, max_delay_ms: int = WS_COALESCE_MAX_DELAY_MS):
+        self.send = send  # async send(message: dict)
+        self.window = window_ms / 1000
+        self.max_delay = max(window_ms, max_delay_ms) / 1000
+        self.listeners: list = []
+        self._pending: list[dict] = []
+        self._first_at: float | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self.events_in = 0
+        self.messages_out = 0
+
+    def publish(self, event: dict):
+        self.events_in += 1
+        self._pending.append(event)
+        if self.window <= 0:
+            self.flush()
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._first_at is None:
+            self._first_at = now
+        deadline = min(now + self.window, self._first_at + self.max_delay)
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(deadline, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        events, self._pending = self._pending, []
+        self._first_at = None
+        if not events:
+            return
+        message = merge_events(events)
+        self.messages_out += 1
+        for callback in self.listeners:
+            try:
+                callback(message)
+            except Exception as e:
+                print("Błąd lokalnego słuchacza zmian:", e)
+        asyncio.ensure_future(self.send(message))
@@ -11,4 +11,99 @@ load_dotenv(BASE_DIR / ".env")
 
 # odczyt wartości z ENV z sensownymi domyślnymi fallbackami
 SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
-SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
\ No newline at end of file
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+
+# SQLite: jak długo czekać na zwolnienie blokady zapisu (GUI i serwer piszą do tego samego pliku)
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# ile razy ponowić zapis, gdy mimo busy_timeout baza jest zablokowana
+DB_WRITE_RETRIES = int(os.getenv("DB_WRITE_RETRIES", "5"))
+# bazowe i maksymalne opóźnienie (ms) między ponowieniami, z losowym rozrzutem
+DB_RETRY_BASE_DELAY_MS = int(os.getenv("DB_RETRY_BASE_DELAY_MS", "50"))
+DB_RETRY_MAX_DELAY_MS = int(os.getenv("DB_RETRY_MAX_DELAY_MS", "1000"))
+
+# tryb wbudowany: main.py uruchamia serwer FastAPI we własnym procesie (zamiast osobnego wifi_server.py)
+EMBEDDED_SERVER = os.getenv("EMBEDDED_SERVER", "0").lower() in ("1", "true", "yes")
+
+# ile ostatnich wpisów dziennika zmian (change_log) trzymać w bazie
+CHANGE_LOG_RETENTION = int(os.getenv("CHANGE_LOG_RETENTION", "10000"))
+
+# liczba procesów uvicorn serwera API
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+# szyna zdarzeń między workerami: "local" (jeden proces), "sqlite" (odpytywanie change_log) lub "auto"
+EVENT_BUS = os.getenv("EVENT_BUS", "auto").lower()
+# co ile sekund worker sprawdza, czy inny proces zapisał zmiany (tryb "sqlite")
+EVENT_BUS_POLL_INTERVAL = float(os.getenv("EVENT_BUS_POLL_INTERVAL", "0.1"))
+
+# WSListener: heartbeat aplikacyjny i ponowne łączenie (sekundy)
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "5"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "5"))
+WS_RECONNECT_MIN_DELAY = float(os.getenv("WS_RECONNECT_MIN_DELAY", "0.5"))
+WS_RECONNECT_MAX_DELAY = float(os.getenv("WS_RECONNECT_MAX_DELAY", "30"))
+
+# okno łączenia zdarzeń o zmianach przed wysłaniem do klientów WS (ms); 0 = bez łączenia
+WS_COALESCE_MS = int(os.getenv("WS_COALESCE_MS", "100"))
+# maksymalne opóźnienie zdarzenia w oknie łączenia (ms)
+WS_COALESCE_MAX_DELAY_MS = int(os.getenv("WS_COALESCE_MAX_DELAY_MS", "500"))
+
+# rozmiar pamięci podręcznej LRU dla pojedynczych odczytów (po id / numerze seryjnym)
+DB_LRU_SIZE = int(os.getenv("DB_LRU_SIZE", "256"))
+
+# kopia zapasowa bazy (API backup SQLite): stron na krok, przerwa między krokami (ms), ile kopii trzymać
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP_MS = int(os.getenv("BACKUP_STEP_SLEEP_MS", "5"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "5"))
+
+# śledzenie propagacji zmian (zapis -> klienci): ile ostatnich śladów trzymać i czy logować linię na potwierdzenie
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "1000"))
+TRACE_LOG = os.getenv("TRACE_LOG", "1").lower() in ("1", "true", "yes")
+
+# wątki serwera wykonujące blokujące operacje na bazie (zapisy, import) poza pętlą asyncio
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "2"))
+
+# wiele magazynów w jednym serwerze: po ilu sekundach bez ruchu zamykać bazę magazynu (domyślny zostaje otwarty)
+INVENTORY_IDLE_TIMEOUT = float(os.getenv("INVENTORY_IDLE_TIMEOUT", "300"))
+
+# replikacja między węzłami (RPi): adresy sąsiadów oddzielone przecinkami, np. "http://192.168.1.20:8000"; puste = wyłączona
+REPLICATION_PEERS = [p.strip().rstrip("/") for p in os.getenv("REPLICATION_PEERS", "").split(",") if p.strip()]
+# jak często sprawdzać lokalne zmiany do wysłania i co ile pobierać zmiany sąsiadów (sekundy)
+REPLICATION_POLL_INTERVAL = float(os.getenv("REPLICATION_POLL_INTERVAL", "0.1"))
+REPLICATION_PULL_INTERVAL = float(os.getenv("REPLICATION_PULL_INTERVAL", "5"))
+# maksymalna liczba zmian w jednej paczce
+REPLICATION_BATCH = int(os.getenv("REPLICATION_BATCH", "500"))
+
+# sumy kontrolne zakresów id (GET /sync/digest): ile kolejnych id obejmuje jeden liść
+DIGEST_LEAF_SIZE = int(os.getenv("DIGEST_LEAF_SIZE", "64"))
+
+# konserwacja bazy w czasie bezczynności: ile sekund bez zapisów to bezczynność, ile stron zwalniać w jednym kroku
+MAINTENANCE_IDLE_SECONDS = float(os.getenv("MAINTENANCE_IDLE_SECONDS", "60"))
+MAINTENANCE_SLICE_PAGES = int(os.getenv("MAINTENANCE_SLICE_PAGES", "256"))
+# odstępy między zadaniami: checkpoint WAL (minuty), optimize/ANALYZE, incremental vacuum, integralność (godziny)
+MAINTENANCE_CHECKPOINT_INTERVAL = float(os.getenv("MAINTENANCE_CHECKPOINT_INTERVAL", "10"))
+MAINTENANCE_OPTIMIZE_INTERVAL = float(os.getenv("MAINTENANCE_OPTIMIZE_INTERVAL", "6"))
+MAINTENANCE_VACUUM_INTERVAL = float(os.getenv("MAINTENANCE_VACUUM_INTERVAL", "24"))
+MAINTENANCE_INTEGRITY_INTERVAL = float(os.getenv("MAINTENANCE_INTEGRITY_INTERVAL", "168"))
+
+# kanał /ws: protokół klienta GUI ("auto" = msgpack, gdy zainstalowany, inaczej JSON; "json" = tekst;
+# "inventory.v2+struct" tylko na wyraźne żądanie)
+WS_PROTOCOL = os.getenv("WS_PROTOCOL", "auto")
+# kompresja permessage-deflate po obu stronach kanału /ws
+WS_COMPRESSION = os.getenv("WS_COMPRESSION", "1").lower() in ("1", "true", "yes")
+
+# long-poll GET /changes/wait: najdłuższy czas trzymania żądania (sekundy)
+CHANGES_WAIT_MAX_TIMEOUT = float(os.getenv("CHANGES_WAIT_MAX_TIMEOUT", "60"))
+
+# kontrola przyjmowania żądań HTTP (na proces): limit równoczesnych żądań i długość kolejki dla odczytów,
+# zapisów i eksportu/importu/kopii; limit 0 = bez ograniczeń. Po przekroczeniu – 429 z Retry-After
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", "16"))
+ADMISSION_READ_QUEUE = int(os.getenv("ADMISSION_READ_QUEUE", "64"))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", "4"))
+ADMISSION_WRITE_QUEUE = int(os.getenv("ADMISSION_WRITE_QUEUE", "32"))
+ADMISSION_EXPORT_LIMIT = int(os.getenv("ADMISSION_EXPORT_LIMIT", "1"))
+ADMISSION_EXPORT_QUEUE = int(os.getenv("ADMISSION_EXPORT_QUEUE", "1"))
+# najdłuższe czekanie w kolejce (sekundy), zanim żądanie dostanie 429
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+# żądania z tej samej maszyny (GUI, kiosk) omijają limity
+ADMISSION_PRIORITY_LOCAL = os.getenv("ADMISSION_PRIORITY_LOCAL", "1").lower() in ("1", "true", "yes")
+
+# katalog danych (baza, eksport, kopie); pusty = data/ obok aplikacji – np. dwa węzły na jednej maszynie
+DATA_DIR = os.getenv("DATA_DIR", "")
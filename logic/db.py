@@ -1,76 +1,1098 @@
+import random
 import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
 from pathlib import Path
 import requests
-from .config import SERVER_HOST, SERVER_PORT
+from . import tracing
+from .config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    DB_BUSY_TIMEOUT_MS,
+    DB_WRITE_RETRIES,
+    DB_RETRY_BASE_DELAY_MS,
+    DB_RETRY_MAX_DELAY_MS,
+    CHANGE_LOG_RETENTION,
+    DB_LRU_SIZE,
+)
+
+
+# kolumny zwracane jako wpis inwentarza (nazwa kategorii ze słownika categories)
+ITEM_COLUMNS = (
+    "i.id, i.name, IFNULL(c.name, '') AS category, i.purchase_date, i.serial_number, "
+    "i.description, i.purchase_day, i.category_id, i.uid, i.version"
+)
+ITEM_FROM = "inventory i LEFT JOIN categories c ON c.id = i.category_id"
+
+# kategorie tworzone w nowej bazie (wcześniej lista na sztywno w GUI)
+DEFAULT_CATEGORIES = [
+    "Narzędzia",
+    "IT",
+    "Oprogramowanie",
+    "Wyposażenie biurowe",
+    "Transport",
+    "BHP",
+    "Meble",
+    "Inne",
+]
+
+# akceptowane zapisy daty zakupu (kanonicznie RRRR-MM-DD)
+_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y", "%Y.%m.%d")
+
+# wyszukiwanie przybliżone: ilu kandydatów z indeksu trygramów oceniamy i od jakiego podobieństwa pokazujemy wynik
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SCORE = 0.3
+
+# ile znaków opisu trafia na listę (ItemCard); pełny opis tylko w podglądzie/edycji
+DESCRIPTION_PREVIEW_LEN = 60
+
+
+def preview_item(item: dict) -> dict:
+    """Projekcja listowa wiersza: skrócony opis + flaga description_truncated."""
+    desc = item.get("description") or ""
+    return {
+        **item,
+        "description": desc[:DESCRIPTION_PREVIEW_LEN],
+        "description_truncated": len(desc) > DESCRIPTION_PREVIEW_LEN,
+    }
+
+
+def parse_purchase_day(value) -> int | None:
+    """
+    Data zakupu jako liczba RRRRMMDD (np. 20230517) – sortuje się i filtruje
+    zakresami po indeksie. Dla pustej lub nierozpoznanej daty zwraca None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.year * 10000 + value.month * 100 + value.day
+    text = str(value).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            d = datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+        return d.year * 10000 + d.month * 100 + d.day
+    return None
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _word_trigrams(text: str) -> set[str]:
+    # każde słowo z dopełnieniem spacjami – liczą się też początki i końce słów
+    grams = set()
+    for word in text.lower().split():
+        grams |= _trigrams(f"  {word} ")
+    return grams
+
+
+def trigram_similarity(query: str, text: str) -> float:
+    """
+    Jaka część trygramów zapytania występuje w tekście (0..1) – literówka psuje
+    tylko kilka trygramów, a fragment nazwy nadal pasuje w całości.
+    Przy remisie wygrywa tekst bliższy długością zapytaniu.
+    """
+    grams = _word_trigrams(query)
+    if not grams:
+        return 0.0
+    common = len(grams & _word_trigrams(text or ""))
+    return common / len(grams) - abs(len(text or "") - len(query)) / 1000
+
+
+def _is_locked_error(exc: sqlite3.OperationalError) -> bool:
+    msg = str(exc).lower()
+    return "database is locked" in msg or "database is busy" in msg
+
+
+class _LRUCache:
+    """Mała pamięć podręczna LRU (bezpieczna wątkowo)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return False, None
+            self._data.move_to_end(key)
+            return True, self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
 
 class Database:
-    def __init__(self, db_path: str | Path):
+    def __init__(self, db_path: str | Path,
+                 busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS,
+                 write_retries: int = DB_WRITE_RETRIES,
+                 on_change=None):
         self.db_path = str(db_path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_retries = write_retries
+        # wywoływane po każdym zatwierdzonym zapisie z opisem zmiany (dict);
+        # domyślnie powiadamia osobny proces serwera przez HTTP
+        self.on_change = on_change if on_change is not None else self.notify_reload
+        # odczyty punktowe: LRU unieważniane, gdy PRAGMA data_version pokaże zapis (też z innego procesu)
+        self._lru = _LRUCache(DB_LRU_SIZE)
+        self._lru_conn: sqlite3.Connection | None = None
+        self._lru_version = None
+        self._lru_lock = threading.Lock()
+        # słownik kategorii nazwa -> id, unieważniany razem z LRU
+        self._category_ids: dict[str, int] | None = None
         self._ensure_schema()
+        # replikacja: identyfikator węzła i zegar wersji wierszy (ms, zawsze rosnący)
+        with self._connect() as conn:
+            self.node_id = conn.execute("SELECT value FROM meta WHERE key = 'node_id'").fetchone()[0]
+            self._clock = conn.execute(
+                "SELECT MAX(IFNULL((SELECT MAX(version) FROM inventory), 0), IFNULL((SELECT MAX(version) FROM tombstones), 0))"
+            ).fetchone()[0]
+            self._has_trigram_index = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'inventory_fts'"
+            ).fetchone() is not None
+        self._clock_lock = threading.Lock()
 
     def _get_conn(self):
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # isolation_level=None -> transakcjami sterujemy sami (BEGIN IMMEDIATE przy zapisie)
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            isolation_level=None,
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA foreign_keys = ON")
         return conn
 
+    @contextmanager
+    def _connect(self):
+        conn = self._get_conn()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _set_journal_mode(self, conn):
+        # zmiana trybu wymaga blokady całej bazy – baza już w WAL (zwykły start) jej nie potrzebuje
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            return
+        # nowa baza: wolne strony po usunięciach oddaje konserwacja (incremental_vacuum);
+        # na istniejącej bazie ustawienie zadziała dopiero po pełnym VACUUM
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL: odczyty nie blokują zapisów i odwrotnie (GUI + serwer na jednym pliku)
+        conn.execute("PRAGMA journal_mode = WAL")
+
     def _ensure_schema(self):
-        with self._get_conn() as conn:
+        # PRAGMA journal_mode nie działa w transakcji, więc bez BEGIN IMMEDIATE, ale z tymi samymi ponowieniami
+        self._retry_locked(self._set_journal_mode)
+        self._write(self._create_tables)
+        self._migrate()
+
+    def _create_tables(self, conn):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS inventory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                category TEXT DEFAULT '',
+                purchase_date TEXT DEFAULT '',
+                serial_number TEXT DEFAULT '',
+                description TEXT DEFAULT ''
+            );
+            """
+        )
+        # dziennik zmian: kolejne numery zmian widoczne dla wszystkich procesów
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                item_id INTEGER,
+                ts REAL NOT NULL
+            );
+            """
+        )
+        # wyszukiwanie po numerze seryjnym (skanery, import z deduplikacją)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_serial ON inventory(serial_number)")
+
+    # -------------------- migracje --------------------
+    # kolejne kroki schematu; numer wykonanego kroku trzymamy w PRAGMA user_version
+    def _migration_purchase_day(self, conn):
+        """Data zakupu jako liczba RRRRMMDD z indeksem (zakresy dat, sortowanie)."""
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(inventory)")}
+        if "purchase_day" not in columns:
+            conn.execute("ALTER TABLE inventory ADD COLUMN purchase_day INTEGER")
+        rows = conn.execute("SELECT id, purchase_date FROM inventory").fetchall()
+        conn.executemany(
+            "UPDATE inventory SET purchase_day = ? WHERE id = ?",
+            [(parse_purchase_day(r["purchase_date"]), r["id"]) for r in rows],
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_purchase_day ON inventory(purchase_day)")
+
+    def _migration_stats(self, conn):
+        """Liczniki per kategoria i rok zakupu utrzymywane triggerami – odczyt statystyk bez skanu tabeli."""
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS stats_category (category TEXT PRIMARY KEY, item_count INTEGER NOT NULL)"
+        )
+        # rok 0 = brak poprawnej daty zakupu
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS stats_year (year INTEGER PRIMARY KEY, item_count INTEGER NOT NULL)"
+        )
+        conn.execute("DELETE FROM stats_category")
+        conn.execute("DELETE FROM stats_year")
+        conn.execute(
+            "INSERT INTO stats_category (category, item_count) "
+            "SELECT IFNULL(category, ''), COUNT(*) FROM inventory GROUP BY IFNULL(category, '')"
+        )
+        conn.execute(
+            "INSERT INTO stats_year (year, item_count) "
+            "SELECT IFNULL(purchase_day / 10000, 0), COUNT(*) FROM inventory GROUP BY IFNULL(purchase_day / 10000, 0)"
+        )
+        add_new = """
+            INSERT INTO stats_category (category, item_count) VALUES (IFNULL(NEW.category, ''), 1)
+                ON CONFLICT(category) DO UPDATE SET item_count = item_count + 1;
+            INSERT INTO stats_year (year, item_count) VALUES (IFNULL(NEW.purchase_day / 10000, 0), 1)
+                ON CONFLICT(year) DO UPDATE SET item_count = item_count + 1;
+        """
+        remove_old = """
+            UPDATE stats_category SET item_count = item_count - 1 WHERE category = IFNULL(OLD.category, '');
+            DELETE FROM stats_category WHERE category = IFNULL(OLD.category, '') AND item_count <= 0;
+            UPDATE stats_year SET item_count = item_count - 1 WHERE year = IFNULL(OLD.purchase_day / 10000, 0);
+            DELETE FROM stats_year WHERE year = IFNULL(OLD.purchase_day / 10000, 0) AND item_count <= 0;
+        """
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_stats_insert AFTER INSERT ON inventory BEGIN {add_new} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_stats_delete AFTER DELETE ON inventory BEGIN {remove_old} END")
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS trg_stats_update AFTER UPDATE OF category, purchase_day ON inventory "
+            f"BEGIN {remove_old} {add_new} END"
+        )
+
+    def _migration_categories(self, conn):
+        """
+        Słownik kategorii z id całkowitymi; inventory trzyma category_id (FK)
+        zamiast powtarzanego tekstu. SQLite nie zmienia typu kolumny w miejscu,
+        więc tabela jest przebudowywana (z zachowaniem id i licznika AUTOINCREMENT).
+        """
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE)"
+        )
+        conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)", [(c,) for c in DEFAULT_CATEGORIES])
+        conn.execute(
+            "INSERT OR IGNORE INTO categories (name) "
+            "SELECT DISTINCT category FROM inventory WHERE IFNULL(category, '') <> ''"
+        )
+
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'inventory'").fetchone()
+        old_seq = row[0] if row else 0
+        conn.execute(
+            """
+            CREATE TABLE inventory_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                category_id INTEGER REFERENCES categories(id),
+                purchase_date TEXT DEFAULT '',
+                serial_number TEXT DEFAULT '',
+                description TEXT DEFAULT '',
+                purchase_day INTEGER
+            )
+            """
+        )
+        conn.execute(
+            "INSERT INTO inventory_new (id, name, category_id, purchase_date, serial_number, description, purchase_day) "
+            "SELECT i.id, i.name, c.id, i.purchase_date, i.serial_number, i.description, i.purchase_day "
+            "FROM inventory i LEFT JOIN categories c ON c.name = i.category"
+        )
+        # razem ze starą tabelą znikają jej indeksy i triggery statystyk
+        conn.execute("DROP TABLE inventory")
+        conn.execute("ALTER TABLE inventory_new RENAME TO inventory")
+        max_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM inventory").fetchone()[0]
+        conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('inventory', 'inventory_new')")
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('inventory', ?)", (max(old_seq, max_id),))
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_serial ON inventory(serial_number)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_purchase_day ON inventory(purchase_day)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory(category_id)")
+
+        # liczniki kategorii po id (0 = bez kategorii)
+        conn.execute("DROP TABLE IF EXISTS stats_category")
+        conn.execute("CREATE TABLE stats_category (category_id INTEGER PRIMARY KEY, item_count INTEGER NOT NULL)")
+        conn.execute(
+            "INSERT INTO stats_category (category_id, item_count) "
+            "SELECT IFNULL(category_id, 0), COUNT(*) FROM inventory GROUP BY IFNULL(category_id, 0)"
+        )
+        add_new = """
+            INSERT INTO stats_category (category_id, item_count) VALUES (IFNULL(NEW.category_id, 0), 1)
+                ON CONFLICT(category_id) DO UPDATE SET item_count = item_count + 1;
+            INSERT INTO stats_year (year, item_count) VALUES (IFNULL(NEW.purchase_day / 10000, 0), 1)
+                ON CONFLICT(year) DO UPDATE SET item_count = item_count + 1;
+        """
+        remove_old = """
+            UPDATE stats_category SET item_count = item_count - 1 WHERE category_id = IFNULL(OLD.category_id, 0);
+            DELETE FROM stats_category WHERE category_id = IFNULL(OLD.category_id, 0) AND item_count <= 0;
+            UPDATE stats_year SET item_count = item_count - 1 WHERE year = IFNULL(OLD.purchase_day / 10000, 0);
+            DELETE FROM stats_year WHERE year = IFNULL(OLD.purchase_day / 10000, 0) AND item_count <= 0;
+        """
+        conn.execute(f"CREATE TRIGGER trg_stats_insert AFTER INSERT ON inventory BEGIN {add_new} END")
+        conn.execute(f"CREATE TRIGGER trg_stats_delete AFTER DELETE ON inventory BEGIN {remove_old} END")
+        conn.execute(
+            "CREATE TRIGGER trg_stats_update AFTER UPDATE OF category_id, purchase_day ON inventory "
+            f"BEGIN {remove_old} {add_new} END"
+        )
+
+    def _migration_trace_id(self, conn):
+        # identyfikator śladu zmiany – workery odczytujące dziennik znają go bez HTTP
+        conn.execute("ALTER TABLE change_log ADD COLUMN trace_id TEXT")
+
+    def _migration_replication(self, conn):
+        """
+        Replikacja między węzłami: globalny uid wiersza, wersja (zegar ms) i węzeł
+        ostatniego zapisu (last-writer-wins), rseq – numer lokalnej zmiany, po którym
+        sąsiedzi pobierają zmiany, oraz nagrobki usuniętych wierszy.
+        """
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('node_id', ?)", (uuid.uuid4().hex,))
+        conn.execute("ALTER TABLE inventory ADD COLUMN uid TEXT")
+        conn.execute("ALTER TABLE inventory ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("ALTER TABLE inventory ADD COLUMN origin TEXT NOT NULL DEFAULT ''")
+        conn.execute("ALTER TABLE inventory ADD COLUMN rseq INTEGER NOT NULL DEFAULT 0")
+        conn.execute("UPDATE inventory SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_uid ON inventory(uid)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_rseq ON inventory(rseq, uid)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tombstones (uid TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+            "origin TEXT NOT NULL, rseq INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tombstones_rseq ON tombstones(rseq, uid)")
+        # każda zmiana pojedynczego wiersza w dzienniku ustawia jego rseq
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS trg_change_rseq AFTER INSERT ON change_log WHEN NEW.item_id IS NOT NULL "
+            "BEGIN UPDATE inventory SET rseq = NEW.seq WHERE id = NEW.item_id; END"
+        )
+        # postęp wymiany z każdym sąsiadem (kursor = (rseq, uid))
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS replication_peers (peer TEXT PRIMARY KEY, "
+            "pushed_seq INTEGER NOT NULL DEFAULT 0, pushed_uid TEXT NOT NULL DEFAULT '', "
+            "pulled_seq INTEGER NOT NULL DEFAULT 0, pulled_uid TEXT NOT NULL DEFAULT '')"
+        )
+
+    def _migration_trigram(self, conn):
+        """
+        Indeks trygramów (FTS5, tokenizer trigram) nazwy i numeru seryjnego do
+        wyszukiwania z literówkami; tabela zewnętrzna – treść zostaje w inventory,
+        a wyzwalacze aktualizują indeks przy każdym zapisie (też z innych procesów).
+        """
+        try:
             conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS inventory (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    category TEXT DEFAULT '',
-                    purchase_date TEXT DEFAULT '',
-                    serial_number TEXT DEFAULT '',
-                    description TEXT DEFAULT ''
-                );
-                """
+                "CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5("
+                "name, serial_number, content='inventory', content_rowid='id', tokenize='trigram')"
             )
+        except sqlite3.OperationalError as e:
+            # SQLite < 3.34 nie ma tokenizera trigram – fuzzy_find porówna wtedy wszystkie wiersze
+            print("Indeks trygramów niedostępny:", e)
+            return
+        conn.execute("INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')")
+        remove_old = ("INSERT INTO inventory_fts(inventory_fts, rowid, name, serial_number) "
+                      "VALUES ('delete', OLD.id, OLD.name, OLD.serial_number);")
+        add_new = "INSERT INTO inventory_fts(rowid, name, serial_number) VALUES (NEW.id, NEW.name, NEW.serial_number);"
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON inventory BEGIN {add_new} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON inventory BEGIN {remove_old} END")
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF name, serial_number ON inventory "
+            f"BEGIN {remove_old} {add_new} END"
+        )
 
-    # -------------------- operacje na danych --------------------
-    def list_items(self) -> list[dict]:
-        with self._get_conn() as conn:
+    def _migrations(self):
+        return [
+            self._migration_purchase_day,
+            self._migration_stats,
+            self._migration_categories,
+            self._migration_trace_id,
+            self._migration_replication,
+            self._migration_trigram,
+        ]
+
+    def _migrate(self):
+        for version, step in enumerate(self._migrations(), start=1):
+            def tx(conn, version=version, step=step):
+                # sprawdzamy pod blokadą zapisu – GUI i serwer mogą startować jednocześnie
+                current = conn.execute("PRAGMA user_version").fetchone()[0]
+                if current >= version:
+                    return False
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                return True
+            if self._write(tx):
+                print(f"Migracja bazy: krok {version} ({step.__name__})")
+
+    # -------------------- transakcje zapisu --------------------
+    def _retry_delay(self, attempt: int) -> float:
+        """Wykładniczy backoff z pełnym losowym rozrzutem (w sekundach)."""
+        cap = min(DB_RETRY_MAX_DELAY_MS, DB_RETRY_BASE_DELAY_MS * (2 ** attempt))
+        return random.uniform(0, cap) / 1000
+
+    def _retry_locked(self, fn):
+        """
+        Wykonuje fn(conn) na nowym połączeniu; gdy mimo busy_timeout baza jest
+        zablokowana, ponawia z backoffem (najwyżej write_retries razy).
+        """
+        attempt = 0
+        while True:
+            with self._connect() as conn:
+                try:
+                    return fn(conn)
+                except sqlite3.OperationalError as e:
+                    if not _is_locked_error(e) or attempt >= self.write_retries:
+                        raise
+            attempt += 1
+            print(f"Baza zablokowana, ponowienie zapisu ({attempt}/{self.write_retries})")
+            time.sleep(self._retry_delay(attempt))
+
+    def _write(self, fn):
+        """
+        Wykonuje fn(conn) w transakcji BEGIN IMMEDIATE.
+        Blokada zapisu jest brana od razu, więc konflikt z drugim procesem
+        kończy się czekaniem (busy_timeout), a nie błędem w połowie transakcji.
+        Jeśli mimo to baza jest zablokowana, zapis jest ponawiany z backoffem.
+        """
+        def tx(conn):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+        return self._retry_locked(tx)
+
+    # -------------------- dziennik zmian --------------------
+    def _log_change(self, conn, op: str, item_id: int | None, trace: dict | None = None) -> int:
+        """Zapisuje zmianę w change_log (w tej samej transakcji) i zwraca jej numer."""
+        seq = conn.execute(
+            "INSERT INTO change_log (op, item_id, ts, trace_id) VALUES (?, ?, ?, ?)",
+            (op, item_id, time.time(), trace["id"] if trace else None),
+        ).lastrowid
+        if seq > CHANGE_LOG_RETENTION:
+            conn.execute("DELETE FROM change_log WHERE seq <= ?", (seq - CHANGE_LOG_RETENTION,))
+        return seq
+
+    def _emit(self, op: str, item_id: int | None, seq: int, item: dict | None = None,
+              trace: dict | None = None, category_ids: list | None = None):
+        event = {"event": "reload", "op": op, "id": item_id, "seq": seq}
+        if category_ids is not None:
+            # kategoria wpisu przed i po zmianie – serwer rozsyła zmianę tylko subskrybentom tych kategorii
+            event["category_ids"] = category_ids
+        if trace is not None:
+            # znaczniki czasu etapów (epoch) – mierzymy drogę zmiany aż do ekranów klientów
+            event["trace"] = {"id": trace["id"], "request": trace["request"], "commit": time.time()}
+        if item is not None:
+            # pełny wiersz po zmianie – dla pamięci podręcznych w tym samym procesie
+            event["item"] = item
+        self.on_change(event)
+
+    def last_change_seq(self) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(seq) FROM change_log").fetchone()
+            return row[0] or 0
+
+    def changes_since(self, seq: int, limit: int = 1000) -> list[dict]:
+        with self._connect() as conn:
             cur = conn.execute(
-                "SELECT id, name, category, purchase_date, serial_number, description FROM inventory ORDER BY id ASC"
+                "SELECT seq, op, item_id, ts, trace_id FROM change_log WHERE seq > ? ORDER BY seq ASC LIMIT ?",
+                (seq, limit),
             )
+            return [dict(r) for r in cur.fetchall()]
+
+    # -------------------- operacje na danych --------------------
+    def list_items(self, preview: bool = False, category: str | None = None,
+                   date_from=None, date_to=None) -> list[dict]:
+        """
+        Wszystkie wpisy. preview=True zwraca projekcję listową: opis skrócony
+        już w SQL (substr), więc długie notatki nie są ładowane do pamięci.
+        date_from / date_to (RRRR-MM-DD lub date, włącznie) filtrują po
+        indeksie idx_inventory_purchase_day; wpisy bez poprawnej daty wtedy odpadają.
+        """
+        if preview:
+            columns = (
+                "i.id, i.name, IFNULL(c.name, '') AS category, i.purchase_date, i.serial_number, "
+                f"substr(i.description, 1, {DESCRIPTION_PREVIEW_LEN}) AS description, "
+                f"length(i.description) > {DESCRIPTION_PREVIEW_LEN} AS description_truncated, "
+                "i.purchase_day, i.category_id, i.uid, i.version"
+            )
+        else:
+            columns = ITEM_COLUMNS
+        where, params = [], []
+        if category is not None:
+            # filtr po małej liczbie całkowitej (idx_inventory_category), nie po tekście
+            if category == "":
+                where.append("i.category_id IS NULL")
+            else:
+                category_id = self._category_map().get(category)
+                if category_id is None:
+                    return []
+                where.append("i.category_id = ?")
+                params.append(category_id)
+        for value, op in ((date_from, ">="), (date_to, "<=")):
+            if value is None or value == "":
+                continue
+            day = parse_purchase_day(value)
+            if day is None:
+                raise ValueError(f"Niepoprawna data: {value!r} (oczekiwano RRRR-MM-DD)")
+            where.append(f"i.purchase_day {op} ?")
+            params.append(day)
+        sql = f"SELECT {columns} FROM {ITEM_FROM}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._connect() as conn:
+            cur = conn.execute(sql + " ORDER BY i.id ASC", params)
             rows = cur.fetchall()
-            return [dict(r) for r in rows]
+            items = [dict(r) for r in rows]
+        if preview:
+            for item in items:
+                item["description_truncated"] = bool(item["description_truncated"])
+        return items
 
-    def add_item(self, name: str, category: str, purchase_date: str,
-                 serial_number: str, description: str) -> int:
-        with self._get_conn() as conn:
+    def get_stats(self) -> dict:
+        """Statystyki z tabel liczników (O(liczba kategorii + lat), bez skanu inventory)."""
+        with self._connect() as conn:
+            categories = {r[0]: r[1] for r in conn.execute(
+                "SELECT IFNULL(c.name, ''), s.item_count FROM stats_category s "
+                "LEFT JOIN categories c ON c.id = s.category_id ORDER BY 1")}
+            years = {r[0]: r[1] for r in conn.execute(
+                "SELECT year, item_count FROM stats_year ORDER BY year")}
+        return {
+            "total": sum(categories.values()),
+            "by_category": categories,
+            # "unknown" = wpisy bez poprawnej daty zakupu
+            "by_year": {(str(year) if year else "unknown"): count for year, count in years.items()},
+        }
+
+    def category_counts(self) -> dict[str, int]:
+        with self._connect() as conn:
+            return {r[0]: r[1] for r in conn.execute(
+                "SELECT IFNULL(c.name, ''), s.item_count FROM stats_category s "
+                "LEFT JOIN categories c ON c.id = s.category_id")}
+
+    def search_item_ids(self, query: str) -> set[int]:
+        """Id wpisów, których nazwa, numer seryjny lub pełny opis zawiera tekst (bez rozróżniania wielkości liter)."""
+        needle = query.lower()
+        with self._connect() as conn:
+            # lower() w SQLite zna tylko ASCII – polskie znaki porównujemy przez str.lower
+            conn.create_function("py_lower", 1, lambda v: (v or "").lower(), deterministic=True)
             cur = conn.execute(
-                "INSERT INTO inventory (name, category, purchase_date, serial_number, description) VALUES (?, ?, ?, ?, ?)",
-                (name, category, purchase_date, serial_number, description),
+                "SELECT id FROM inventory WHERE instr(py_lower(name), ?1) OR instr(py_lower(serial_number), ?1) OR instr(py_lower(description), ?1)",
+                (needle,),
             )
-            conn.commit()
-            new_id = cur.lastrowid
-        self.notify_reload()  # ⬅️ zawołaj broadcast po zmianie
+            return {r[0] for r in cur.fetchall()}
+
+    def fuzzy_find(self, text: str, limit: int = 10) -> list[dict]:
+        """
+        Wpisy o nazwie lub numerze seryjnym podobnym do tekstu (literówki, pomylony znak),
+        od najbardziej podobnych; każdy z polem "score" (0..1). Kandydatów daje indeks
+        trygramów (bez skanu tabeli), ocenę – trigram_similarity.
+        """
+        needle = (text or "").strip()
+        grams = _trigrams(needle.lower())
+        if not grams:
+            return []
+        if self._has_trigram_index:
+            match = " OR ".join('"' + g.replace('"', '""') + '"' for g in sorted(grams))
+            with self._connect() as conn:
+                ids = [r[0] for r in conn.execute(
+                    "SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (match, FUZZY_CANDIDATES),
+                )]
+            candidates = self.get_items(ids)
+        else:
+            candidates = self.list_items()
+        scored = []
+        for item in candidates:
+            score = max(trigram_similarity(needle, item["name"]), trigram_similarity(needle, item["serial_number"]))
+            if score >= FUZZY_MIN_SCORE:
+                scored.append({**item, "score": round(max(score, 0.0), 3)})
+        scored.sort(key=lambda it: (-it["score"], it["id"]))
+        return scored[:limit]
+
+    def count_items(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM inventory").fetchone()[0]
+
+    def iter_items(self, chunk_size: int = 500):
+        """Generator wierszy po id, porcjami (stronicowanie po kluczu) – bez ładowania całej tabeli."""
+        last_id = 0
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT {ITEM_COLUMNS} FROM {ITEM_FROM} WHERE i.id > ? ORDER BY i.id ASC LIMIT ?",
+                    (last_id, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield dict(r)
+            last_id = rows[-1]["id"]
+
+    def _validate_lru(self):
+        with self._lru_lock:
+            if self._lru_conn is None:
+                self._lru_conn = self._get_conn()
+            version = self._lru_conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._lru_version:
+                self._lru_version = version
+                self._lru.clear()
+                self._category_ids = None
+            return version
+
+    def _cached_lookup(self, key, query: str, params) -> dict | None:
+        version = self._validate_lru()
+        hit, value = self._lru.get(key)
+        if hit:
+            return value
+        with self._connect() as conn:
+            row = conn.execute(query, params).fetchone()
+        value = dict(row) if row is not None else None
+        with self._lru_lock:
+            # nie zapisuj wyniku, jeśli w międzyczasie ktoś unieważnił pamięć po zapisie
+            if version == self._lru_version:
+                self._lru.put(key, value)
+        return value
+
+    def close(self):
+        """Zamyka trwałe połączenie odczytów punktowych (otworzy się ponownie przy potrzebie)."""
+        with self._lru_lock:
+            if self._lru_conn is not None:
+                self._lru_conn.close()
+                self._lru_conn = None
+                self._lru_version = None
+                self._lru.clear()
+                self._category_ids = None
+
+    # -------------------- kategorie --------------------
+    def _category_map(self) -> dict[str, int]:
+        """Nazwa -> id kategorii; czytane z bazy tylko po zmianie (data_version)."""
+        version = self._validate_lru()
+        with self._lru_lock:
+            if self._category_ids is not None:
+                return self._category_ids
+        with self._connect() as conn:
+            mapping = {r["name"]: r["id"] for r in conn.execute("SELECT id, name FROM categories")}
+        with self._lru_lock:
+            # jak w _cached_lookup: po unieważnieniu w międzyczasie odczyt mógł być sprzed zapisu
+            if version == self._lru_version:
+                self._category_ids = mapping
+        return mapping
+
+    def _resolve_category_ids(self, conn, names) -> dict[str, int | None]:
+        """
+        Id dla nazw kategorii w ramach transakcji zapisu; brakujące są dodawane
+        do słownika. Pusta nazwa -> NULL (bez kategorii).
+        """
+        known = self._category_map()  # pod BEGIN IMMEDIATE nikt inny nie zmieni słownika
+        result: dict[str, int | None] = {"": None}
+        for name in set(names):
+            if not name:
+                continue
+            if name in known:
+                result[name] = known[name]
+            else:
+                result[name] = conn.execute("INSERT INTO categories (name) VALUES (?)", (name,)).lastrowid
+        return result
+
+    def list_categories(self) -> list[dict]:
+        """Kategorie z liczbą wpisów (z tabeli liczników), alfabetycznie."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "SELECT c.id, c.name, IFNULL(s.item_count, 0) AS item_count FROM categories c "
+                "LEFT JOIN stats_category s ON s.category_id = c.id ORDER BY c.name"
+            )
+            return [dict(r) for r in cur.fetchall()]
+
+    def add_category(self, name: str) -> int:
+        """Dodaje kategorię; ValueError, gdy nazwa pusta lub już istnieje."""
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("Nazwa kategorii nie może być pusta.")
+
+        def tx(conn):
+            if conn.execute("SELECT 1 FROM categories WHERE name = ?", (name,)).fetchone():
+                raise ValueError(f"Kategoria {name!r} już istnieje.")
+            new_id = conn.execute("INSERT INTO categories (name) VALUES (?)", (name,)).lastrowid
+            return new_id, self._log_change(conn, "categories", None, trace)
+
+        trace = tracing.start()
+        new_id, seq = self._write(tx)
+        self.notify_bulk_change("categories", seq, trace)
+        return new_id
+
+    def rename_category(self, category_id: int, name: str) -> bool:
+        """Zmienia nazwę we wszystkich wpisach naraz (jeden wiersz słownika). False, gdy brak kategorii."""
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("Nazwa kategorii nie może być pusta.")
+
+        def tx(conn):
+            if conn.execute("SELECT 1 FROM categories WHERE name = ? AND id <> ?", (name, category_id)).fetchone():
+                raise ValueError(f"Kategoria {name!r} już istnieje.")
+            cur = conn.execute("UPDATE categories SET name = ? WHERE id = ?", (name, category_id))
+            if cur.rowcount == 0:
+                return None
+            seq = self._log_change(conn, "categories", None, trace)
+            # nazwa kategorii jest częścią replikowanego wiersza – nowa wersja dla jej wpisów
+            conn.execute(
+                "UPDATE inventory SET version = ?, origin = ?, rseq = ? WHERE category_id = ?",
+                (self._tick(), self.node_id, seq, category_id),
+            )
+            return seq
+
+        trace = tracing.start()
+        seq = self._write(tx)
+        if seq is None:
+            return False
+        self.notify_bulk_change("categories", seq, trace)
+        return True
+
+    def delete_category(self, category_id: int) -> bool:
+        """Usuwa nieużywaną kategorię; ValueError, gdy są do niej przypisane wpisy."""
+        def tx(conn):
+            used = conn.execute(
+                "SELECT COUNT(*) FROM inventory WHERE category_id = ?", (category_id,)
+            ).fetchone()[0]
+            if used:
+                raise ValueError(f"Kategoria jest używana przez {used} wpisów.")
+            cur = conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            if cur.rowcount == 0:
+                return None
+            return self._log_change(conn, "categories", None, trace)
+
+        trace = tracing.start()
+        seq = self._write(tx)
+        if seq is None:
+            return False
+        self.notify_bulk_change("categories", seq, trace)
+        return True
+
+    def get_item(self, item_id: int) -> dict | None:
+        return self._cached_lookup(
+            ("id", item_id),
+            f"SELECT {ITEM_COLUMNS} FROM {ITEM_FROM} WHERE i.id = ?",
+            (item_id,),
+        )
+
+    def get_item_by_serial(self, serial_number: str) -> dict | None:
+        """Pierwszy (najniższe id) wpis o danym numerze seryjnym – korzysta z idx_inventory_serial."""
+        return self._cached_lookup(
+            ("serial", serial_number),
+            f"SELECT {ITEM_COLUMNS} FROM {ITEM_FROM} WHERE i.serial_number = ? ORDER BY i.id ASC LIMIT 1",
+            (serial_number,),
+        )
+
+    def iter_items_by_ids(self, ids, chunk_size: int = 500):
+        """Pełne wiersze dla podanych id, porcjami, w kolejności listy `ids`."""
+        ids = list(ids)
+        for i in range(0, len(ids), chunk_size):
+            part = ids[i:i + chunk_size]
+            fetched = {item["id"]: item for item in self.get_items(part)}
+            for item_id in part:
+                if item_id in fetched:
+                    yield fetched[item_id]
+
+    def get_items(self, ids) -> list[dict]:
+        ids = list(ids)
+        if not ids:
+            return []
+        placeholders = ", ".join("?" * len(ids))
+        with self._connect() as conn:
+            cur = conn.execute(
+                f"SELECT {ITEM_COLUMNS} FROM {ITEM_FROM} WHERE i.id IN ({placeholders}) ORDER BY i.id ASC",
+                ids,
+            )
+            return [dict(r) for r in cur.fetchall()]
+
+    def add_item(self, name: str, category: str, purchase_date: str,
+                 serial_number: str, description: str) -> int:
+        def tx(conn):
+            category_id = self._resolve_category_ids(conn, [category])[category]
+            new_id = conn.execute(
+                "INSERT INTO inventory (name, category_id, purchase_date, serial_number, description, purchase_day, uid, version, origin) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, category_id, purchase_date, serial_number, description, purchase_day, uid, version, self.node_id),
+            ).lastrowid
+            return new_id, category_id, self._log_change(conn, "add", new_id, trace)
+
+        trace = tracing.start()
+        category = category or ""
+        purchase_day = parse_purchase_day(purchase_date)
+        uid, version = uuid.uuid4().hex, self._tick()
+        new_id, category_id, seq = self._write(tx)
+        item = {"id": new_id, "name": name, "category": category, "purchase_date": purchase_date,
+                "serial_number": serial_number, "description": description, "purchase_day": purchase_day,
+                "category_id": category_id, "uid": uid, "version": version}
+        self._emit("add", new_id, seq, item, trace, [category_id])  # ⬅️ zawołaj broadcast po zmianie
         return new_id
 
     def update_item(self, item_id: int, name: str, category: str,
                     purchase_date: str, serial_number: str, description: str) -> None:
-        with self._get_conn() as conn:
+        def tx(conn):
+            category_id = self._resolve_category_ids(conn, [category])[category]
+            before = conn.execute("SELECT category_id FROM inventory WHERE id = ?", (item_id,)).fetchone()
             conn.execute(
-                "UPDATE inventory SET name=?, category=?, purchase_date=?, serial_number=?, description=? WHERE id=?",
-                (name, category, purchase_date, serial_number, description, item_id),
+                "UPDATE inventory SET name=?, category_id=?, purchase_date=?, serial_number=?, description=?, purchase_day=?, "
+                "version=?, origin=? WHERE id=?",
+                (name, category_id, purchase_date, serial_number, description, purchase_day, version, self.node_id, item_id),
             )
-            conn.commit()
-        self.notify_reload()
+            row = conn.execute("SELECT uid FROM inventory WHERE id = ?", (item_id,)).fetchone()
+            return self._log_change(conn, "update", item_id, trace), category_id, row, before
+
+        trace = tracing.start()
+        category = category or ""
+        purchase_day = parse_purchase_day(purchase_date)
+        version = self._tick()
+        seq, category_id, row, before = self._write(tx)
+        item = None
+        category_ids = None
+        if row is not None:
+            category_ids = list({before["category_id"], category_id})
+            item = {"id": item_id, "name": name, "category": category, "purchase_date": purchase_date,
+                    "serial_number": serial_number, "description": description, "purchase_day": purchase_day,
+                    "category_id": category_id, "uid": row["uid"], "version": version}
+        self._emit("update", item_id, seq, item, trace, category_ids)
 
     def delete_item(self, item_id: int) -> None:
-        with self._get_conn() as conn:
+        def tx(conn):
+            row = conn.execute("SELECT uid, category_id FROM inventory WHERE id = ?", (item_id,)).fetchone()
             conn.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
-            conn.commit()
-        self.notify_reload()
+            seq = self._log_change(conn, "delete", item_id, trace)
+            if row is not None:
+                # nagrobek: usunięcie dociera do pozostałych węzłów
+                conn.execute(
+                    "INSERT OR REPLACE INTO tombstones (uid, version, origin, rseq) VALUES (?, ?, ?, ?)",
+                    (row["uid"], self._tick(), self.node_id, seq),
+                )
+            return seq, row
+
+        trace = tracing.start()
+        seq, row = self._write(tx)
+        self._emit("delete", item_id, seq, trace=trace, category_ids=[row["category_id"]] if row is not None else None)
+
+    def upsert_items(self, rows: list[dict], notify: bool = True, trace: dict | None = None) -> dict:
+        """
+        Zbiorczy zapis w jednej transakcji (executemany). Wiersze z numerem
+        seryjnym, który już jest w bazie, aktualizują istniejący wpis (ten o
+        najmniejszym id, jak get_item_by_serial); pozostałe są dodawane.
+        Zwraca liczniki faktycznie zmienionych wierszy i numer zmiany w dzienniku.
+        """
+        def tx(conn):
+            by_serial: dict[str, dict] = {}
+            without_serial: list[dict] = []
+            for row in rows:
+                if row["serial_number"]:
+                    by_serial[row["serial_number"]] = row  # duplikat w paczce: wygrywa ostatni
+                else:
+                    without_serial.append(row)
+
+            # numer seryjny nie jest unikalny – aktualizujemy jeden wpis, ten o najmniejszym id
+            existing: dict[str, int] = {}
+            serials = list(by_serial)
+            for i in range(0, len(serials), 500):
+                part = serials[i:i + 500]
+                placeholders = ", ".join("?" * len(part))
+                cur = conn.execute(
+                    f"SELECT serial_number, MIN(id) FROM inventory WHERE serial_number IN ({placeholders}) "
+                    "GROUP BY serial_number",
+                    part,
+                )
+                existing.update((r[0], r[1]) for r in cur.fetchall())
+
+            to_update = [by_serial[sn] for sn in serials if sn in existing]
+            to_insert = [by_serial[sn] for sn in serials if sn not in existing] + without_serial
+            category_ids = self._resolve_category_ids(conn, (r["category"] for r in rows))
+            seq = self._log_change(conn, "import", None, trace)
+            version = self._tick()
+            updated = conn.executemany(
+                "UPDATE inventory SET name=?, category_id=?, purchase_date=?, description=?, purchase_day=?, "
+                "version=?, origin=?, rseq=? WHERE id=?",
+                [(r["name"], category_ids[r["category"]], r["purchase_date"], r["description"],
+                  parse_purchase_day(r["purchase_date"]), version, self.node_id, seq, existing[r["serial_number"]])
+                 for r in to_update],
+            ).rowcount if to_update else 0
+            conn.executemany(
+                "INSERT INTO inventory (name, category_id, purchase_date, serial_number, description, purchase_day, "
+                "uid, version, origin, rseq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(r["name"], category_ids[r["category"]], r["purchase_date"], r["serial_number"], r["description"],
+                  parse_purchase_day(r["purchase_date"]), uuid.uuid4().hex, version, self.node_id, seq)
+                 for r in to_insert],
+            )
+            return {"inserted": len(to_insert), "updated": updated, "seq": seq}
+
+        trace = trace or tracing.start()
+        result = self._write(tx)
+        if notify:
+            self.notify_bulk_change("import", result["seq"], trace)
+        return result
+
+    def notify_bulk_change(self, op: str, seq: int, trace: dict | None = None):
+        """Zmiana wielu wierszy naraz – odbiorcy przeładowują całość."""
+        self._emit(op, None, seq, trace=trace)
+
+    # -------------------- replikacja między węzłami --------------------
+    def _tick(self) -> int:
+        """Nowa wersja wiersza: czas w ms, ale zawsze większa od każdej dotąd widzianej."""
+        with self._clock_lock:
+            self._clock = max(self._clock + 1, int(time.time() * 1000))
+            return self._clock
+
+    def _observe(self, version: int):
+        with self._clock_lock:
+            self._clock = max(self._clock, version)
+
+    def replication_changes(self, since_seq: int = 0, since_uid: str = "", limit: int = 500) -> list[dict]:
+        """
+        Wiersze i nagrobki zmienione lokalnie po kursorze (rseq, uid), w kolejności rseq.
+        Kursor nie zależy od dziennika change_log, więc sąsiad nadrobi też długą przerwę.
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                """
+                SELECT * FROM (
+                    SELECT i.uid, i.rseq, i.version, i.origin, 0 AS deleted, i.name,
+                           IFNULL(c.name, '') AS category, i.purchase_date, i.serial_number, i.description
+                    FROM inventory i LEFT JOIN categories c ON c.id = i.category_id
+                    UNION ALL
+                    SELECT t.uid, t.rseq, t.version, t.origin, 1, NULL, NULL, NULL, NULL, NULL
+                    FROM tombstones t
+                )
+                WHERE (rseq, uid) > (?, ?)
+                ORDER BY rseq, uid
+                LIMIT ?
+                """,
+                (since_seq, since_uid, limit),
+            )
+            changes = [dict(r) for r in cur.fetchall()]
+        for change in changes:
+            change["deleted"] = bool(change["deleted"])
+            if change["deleted"]:
+                for key in ("name", "category", "purchase_date", "serial_number", "description"):
+                    del change[key]
+        return changes
+
+    def apply_replicated(self, changes: list[dict]) -> dict:
+        """
+        Zmiany od innego węzła, last-writer-wins: wygrywa wyższa (version, origin).
+        Zastosowane zmiany dostają lokalny rseq, więc trafiają dalej do kolejnych węzłów.
+        """
+        def tx(conn):
+            applied: list[tuple[str, int | None, int]] = []
+            skipped = 0
+            category_ids = self._resolve_category_ids(
+                conn, (c.get("category") or "" for c in changes if not c.get("deleted"))
+            )
+            for change in changes:
+                uid = change["uid"]
+                incoming = (int(change["version"]), change.get("origin") or "")
+                row = conn.execute("SELECT id, version, origin FROM inventory WHERE uid = ?", (uid,)).fetchone()
+                tomb = conn.execute("SELECT version, origin FROM tombstones WHERE uid = ?", (uid,)).fetchone()
+                current = max(
+                    [(r["version"], r["origin"]) for r in (row, tomb) if r is not None],
+                    default=None,
+                )
+                if current is not None and incoming <= current:
+                    skipped += 1
+                    continue
+                if change.get("deleted"):
+                    item_id = row["id"] if row is not None else None
+                    if item_id is not None:
+                        conn.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
+                    seq = self._log_change(conn, "delete", item_id)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO tombstones (uid, version, origin, rseq) VALUES (?, ?, ?, ?)",
+                        (uid, incoming[0], incoming[1], seq),
+                    )
+                    applied.append(("delete", item_id, seq))
+                    continue
+                values = (
+                    change["name"], category_ids[change.get("category") or ""], change.get("purchase_date") or "",
+                    change.get("serial_number") or "", change.get("description") or "",
+                    parse_purchase_day(change.get("purchase_date")), incoming[0], incoming[1],
+                )
+                if row is not None:
+                    conn.execute(
+                        "UPDATE inventory SET name=?, category_id=?, purchase_date=?, serial_number=?, description=?, "
+                        "purchase_day=?, version=?, origin=? WHERE id=?",
+                        values + (row["id"],),
+                    )
+                    op, item_id = "update", row["id"]
+                else:
+                    item_id = conn.execute(
+                        "INSERT INTO inventory (name, category_id, purchase_date, serial_number, description, "
+                        "purchase_day, version, origin, uid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        values + (uid,),
+                    ).lastrowid
+                    op = "add"
+                if tomb is not None:
+                    conn.execute("DELETE FROM tombstones WHERE uid = ?", (uid,))
+                applied.append((op, item_id, self._log_change(conn, op, item_id)))
+            return applied, skipped
+
+        if not changes:
+            return {"applied": 0, "skipped": 0}
+        self._observe(max(int(c["version"]) for c in changes))
+        applied, skipped = self._write(tx)
+        if len(applied) > 200:
+            # duża paczka (nadrabianie po przerwie) – odbiorcy przeładowują całość
+            self.notify_bulk_change("replicate", applied[-1][2])
+        else:
+            for op, item_id, seq in applied:
+                self._emit(op, item_id, seq)
+        return {"applied": len(applied), "skipped": skipped}
+
+    def get_peer_cursors(self, peer: str) -> dict:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM replication_peers WHERE peer = ?", (peer,)).fetchone()
+        if row is None:
+            return {"peer": peer, "pushed_seq": 0, "pushed_uid": "", "pulled_seq": 0, "pulled_uid": ""}
+        return dict(row)
+
+    def set_peer_cursor(self, peer: str, direction: str, seq: int, uid: str):
+        """Zapamiętuje postęp wysyłania ("pushed") lub pobierania ("pulled") dla sąsiada."""
+        if direction not in ("pushed", "pulled"):
+            raise ValueError(direction)
+
+        def tx(conn):
+            conn.execute("INSERT OR IGNORE INTO replication_peers (peer) VALUES (?)", (peer,))
+            conn.execute(
+                f"UPDATE replication_peers SET {direction}_seq = ?, {direction}_uid = ? WHERE peer = ?",
+                (seq, uid, peer),
+            )
+
+        self._write(tx)
 
     # -------- powiadomienie FastAPI --------
-    def notify_reload(self):
+    def notify_reload(self, event: dict | None = None):
         """Po każdej zmianie w bazie Tkinter powiadamia serwer FastAPI."""
         url = f"http://{SERVER_HOST}:{SERVER_PORT}/notify_reload"
         try:
-            requests.post(url, timeout=1)
+            payload = {k: v for k, v in (event or {}).items() if k != "item"}
+            requests.post(url, json=payload or None, timeout=1)
             print("notify_reload -> wysłano do serwera FastAPI")
         except Exception as e:
-            print("Nie udało się powiadomić serwera:", e)
\ No newline at end of file
+            print("Nie udało się powiadomić serwera:", e)
@@ -0,0 +1,99 @@
+import hashlib
+
+from .config import DIGEST_LEAF_SIZE
+
+
+def row_hash(item: dict) -> int:
+    """64-bitowy skrót wiersza: id i wersja (każdy zapis podbija wersję)."""
+    data = f"{item['id']}:{item.get('version') or 0}".encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class RangeDigest:
+    """
+    Sumy kontrolne zakresów id (w stylu drzewa Merkle): wiersze dzielimy na
+    liście po `leaf` kolejnych id, skrót liścia to XOR skrótów jego wierszy.
+    XOR pozwala aktualizować liść przy każdym zapisie bez przeliczania,
+    a skrót dowolnego zakresu wyrównanego do liści to XOR jego liści.
+    """
+
+    def __init__(self, leaf: int = DIGEST_LEAF_SIZE):
+        self.leaf = leaf
+        self.leaves: dict[int, list[int]] = {}  # numer liścia -> [skrót, liczba wierszy]
+
+    def add(self, item: dict):
+        entry = self.leaves.setdefault(item["id"] // self.leaf, [0, 0])
+        entry[0] ^= row_hash(item)
+        entry[1] += 1
+
+    def remove(self, item: dict):
+        key = item["id"] // self.leaf
+        entry = self.leaves.get(key)
+        if entry is None:
+            return
+        entry[0] ^= row_hash(item)
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.leaves[key]
+
+    def upper_bound(self) -> int:
+        """Pierwsze id za ostatnim niepustym liściem (wyrównane do liścia)."""
+        return (max(self.leaves) + 1) * self.leaf if self.leaves else self.leaf
+
+    def summary(self, lo: int = 0, hi: int | None = None, parts: int = 16) -> dict:
+        """
+        Skrót zakresu [lo, hi) i jego podział na `parts` podzakresów
+        wyrównanych do liści. Zakres nie szerszy niż liść nie ma podziału –
+        wtedy klient pobiera po prostu jego wiersze.
+        """
+        leaf = self.leaf
+        lo = max(0, lo) // leaf * leaf
+        hi = self.upper_bound() if hi is None else -(-max(hi, lo + 1) // leaf) * leaf
+        parts = max(1, parts)
+        width = max(1, -(-(hi - lo) // leaf // parts)) * leaf
+        buckets = [[0, 0] for _ in range(-(-(hi - lo) // width))] if hi - lo > leaf else []
+        total_hash, total_count = 0, 0
+        for key, (h, count) in self.leaves.items():
+            start = key * leaf
+            if not lo <= start < hi:
+                continue
+            total_hash ^= h
+            total_count += count
+            if buckets:
+                bucket = buckets[(start - lo) // width]
+                bucket[0] ^= h
+                bucket[1] += count
+        ranges = [{"lo": lo + i * width, "hi": min(hi, lo + (i + 1) * width), "count": count, "hash": f"{h:016x}"}
+                  for i, (h, count) in enumerate(buckets)]
+        return {"leaf": leaf, "lo": lo, "hi": hi, "count": total_count, "hash": f"{total_hash:016x}", "ranges": ranges}
+
+
+def find_stale_ranges(fetch_digest, local: RangeDigest, parts: int = 16) -> list[tuple[int, int]]:
+    """
+    Strona klienta: porównuje lokalne skróty z serwerem i schodzi tylko do
+    zakresów, które się różnią. `fetch_digest(lo, hi, parts)` zwraca odpowiedź
+    GET /sync/digest. Wynik to zakresy [lo, hi), których wiersze trzeba
+    pobrać na nowo (GET /sync/rows); pusta lista = kopie są zgodne.
+    """
+    remote = fetch_digest(0, None, parts)
+    if local.upper_bound() > remote["hi"]:
+        # lokalnie są wiersze o id większych niż na serwerze (np. usunięte)
+        remote = fetch_digest(0, local.upper_bound(), parts)
+    stale = []
+    pending = [remote]
+    while pending:
+        node = pending.pop()
+        mine = local.summary(node["lo"], node["hi"], parts)
+        if mine["hash"] == node["hash"] and mine["count"] == node["count"]:
+            continue
+        if not node["ranges"]:
+            stale.append((node["lo"], node["hi"]))
+            continue
+        for theirs, ours in zip(node["ranges"], mine["ranges"]):
+            if theirs["hash"] == ours["hash"] and theirs["count"] == ours["count"]:
+                continue
+            if theirs["hi"] - theirs["lo"] <= node["leaf"]:
+                stale.append((theirs["lo"], theirs["hi"]))
+            else:
+                pending.append(fetch_digest(theirs["lo"], theirs["hi"], parts))
+    return sorted(stale)
@@ -0,0 +1,24 @@
+import threading
+
+import uvicorn
+
+from .config import WS_COMPRESSION
+
+
+class EmbeddedServer:
+    """Serwer uvicorn uruchomiony w wątku tła procesu GUI (własna pętla asyncio)."""
+
+    def __init__(self, app, host: str = "0.0.0.0", port: int = 8000):
+        config = uvicorn.Config(app, host=host, port=port, log_level="info", ws_per_message_deflate=WS_COMPRESSION)
+        self.server = uvicorn.Server(config)
+        # sygnały (Ctrl+C) obsługuje główny wątek Qt, nie serwer
+        self.server.install_signal_handlers = lambda: None
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.server.should_exit = True
+        if self.thread.is_alive():
+            self.thread.join(timeout)
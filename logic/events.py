@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+
+from .config import EVENT_BUS, EVENT_BUS_POLL_INTERVAL, SERVER_WORKERS
+
+
+class LocalEventBus:
+    """Zdarzenia w obrębie jednego procesu – wystarcza przy jednym workerze uvicorn."""
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._deliver = None
+
+    async def start(self, deliver):
+        """deliver(event) – funkcja rozsyłająca zdarzenie do klientów tego workera."""
+        self._loop = asyncio.get_running_loop()
+        self._deliver = deliver
+
+    async def stop(self):
+        self._loop = None
+
+    def publish(self, event: dict):
+        """Zmiana zapisana przez ten proces; można wołać z dowolnego wątku."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._deliver, event)
+
+    def notify_external(self, event: dict | None = None):
+        """Zmiana zapisana przez inny proces (np. /notify_reload z GUI)."""
+        self.publish(event or {"event": "reload"})
+
+
+class SQLiteEventBus:
+    """
+    Zdarzenia przez tabelę change_log wspólnej bazy.
+    Każdy worker odpytuje dziennik (tanio: PRAGMA data_version) i rozsyła
+    zmiany tylko do swoich klientów, więc zapis w jednym workerze dociera
+    do gniazd podłączonych do wszystkich pozostałych. Zapytania idą w osobnym
+    wątku – zajęta baza (checkpoint, blokada zapisu) nie wstrzymuje pętli serwera.
+    """
+
+    def __init__(self, db, interval: float = EVENT_BUS_POLL_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._deliver = None
+        self._task: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._reading: asyncio.Task | None = None
+        self._last_seq = 0
+        self._data_version = None
+
+    async def start(self, deliver):
+        self._loop = asyncio.get_running_loop()
+        self._deliver = deliver
+        self._wake = asyncio.Event()
+        # osobne, trwałe połączenie: data_version zmienia się tylko po zapisach innych połączeń
+        self._conn = await asyncio.to_thread(self.db._get_conn)
+        self._last_seq = await asyncio.to_thread(self.db.last_change_seq)
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._reading is not None:
+            # zapytanie w wątku trwa mimo anulowania – połączenie zamykamy dopiero po nim
+            await asyncio.wait([self._reading])
+            self._reading = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._loop = None
+
+    def publish(self, event: dict):
+        # zmiana jest już w change_log – wystarczy obudzić odpytywanie
+        self.notify_external()
+
+    def notify_external(self, event: dict | None = None):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._wake.set)
+
+    def _read_new_changes(self) -> list[dict]:
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return []
+        self._data_version = version
+        cur = self._conn.execute(
+            "SELECT seq, op, item_id, ts, trace_id FROM change_log WHERE seq > ? ORDER BY seq ASC",
+            (self._last_seq,),
+        )
+        events = []
+        for r in cur.fetchall():
+            event = {"event": "reload", "op": r["op"], "id": r["item_id"], "seq": r["seq"]}
+            if r["trace_id"]:
+                event["trace"] = {"id": r["trace_id"], "commit": r["ts"]}
+            events.append(event)
+        return events
+
+    async def _poll(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            self._reading = asyncio.ensure_future(asyncio.to_thread(self._read_new_changes))
+            try:
+                events = await asyncio.shield(self._reading)
+            except sqlite3.Error as e:
+                print("Błąd odczytu dziennika zmian:", e)
+                continue
+            for event in events:
+                self._last_seq = event["seq"]
+                self._deliver(event)
+
+
+def create_event_bus(db):
+    """Wybiera szynę zdarzeń wg EVENT_BUS ("auto": sqlite przy kilku workerach)."""
+    kind = EVENT_BUS
+    if kind == "auto":
+        kind = "sqlite" if SERVER_WORKERS > 1 else "local"
+    if kind == "sqlite":
+        return SQLiteEventBus(db)
+    if kind != "local":
+        print(f"Nieznany EVENT_BUS={EVENT_BUS!r}, używam 'local'")
+    return LocalEventBus()
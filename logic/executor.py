@@ -0,0 +1,42 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import DB_EXECUTOR_WORKERS
+
+
+class DatabaseExecutor:
+    """
+    Osobna pula wątków na blokujące wywołania Database z kodu asyncio:
+    commit (i czekanie na blokadę zapisu) nie wstrzymuje pętli serwera,
+    więc odczyty i ruch WebSocket idą dalej. Pula jest oddzielona od puli
+    starlette, żeby długi import nie zajął wątków obsługujących odczyty.
+    Tylko zapisy: odczyty z kodu asyncio (dziennik zmian, słownik kategorii)
+    idą przez asyncio.to_thread, bo tu czekałyby w kolejce za wolnym zapisem.
+    """
+
+    def __init__(self, workers: int = DB_EXECUTOR_WORKERS):
+        self.workers = max(1, workers)
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="db")
+            return self._pool
+
+    async def run(self, fn, *args, **kwargs):
+        """Wykonuje fn w puli; kontekst (np. ślad zmiany z tracing) przechodzi do wątku."""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, fn, *args, **kwargs)
+        return await loop.run_in_executor(self._get_pool(), call)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
@@ -1,20 +1,72 @@
 import csv
+import os
+from itertools import islice
 from pathlib import Path
 
-def export_inventory_to_csv(rows, output_path: Path) -> None:
-    if not rows:
-      # Pusta lista — można zapisać nagłówki
-      fieldnames = ["id", "name", "category", "purchase_date", "serial_number", "description"]
-    else:
-      fieldnames = list(rows[0].keys())
+EXPORT_FIELDS = ["id", "name", "category", "purchase_date", "serial_number", "description"]
+
+
+class ExportCancelled(Exception):
+    """Eksport przerwany przez użytkownika – plik docelowy pozostaje nietknięty."""
+
+
+def export_rows_to_csv(rows, output_path: Path, total: int | None = None,
+                       progress=None, cancel_event=None, chunk_size: int = 500) -> int:
+    """
+    Zapisuje wiersze do CSV porcjami, najpierw do pliku tymczasowego obok
+    docelowego; po fsync plik jest podmieniany atomowo (os.replace), więc
+    wyjęty pendrive nie zostawi uciętego export.csv.
 
+    progress(done, total) wołane po każdej porcji, cancel_event (threading.Event)
+    sprawdzane między porcjami. Zwraca liczbę zapisanych wierszy.
+    """
+    output_path = Path(output_path)
     # Upewnij się, że katalog istnieje
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
 
-    with open(output_path, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    rows = iter(rows)
+    done = 0
+    try:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                writer.writerows(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total if total is not None else done)
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+    # utrwal też wpis katalogu (rename), tam gdzie system plików na to pozwala
+    try:
+        dir_fd = os.open(output_path.parent, os.O_RDONLY)
+    except OSError:
+        return done
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+    return done
+
+
+def export_inventory_to_csv(rows, output_path: Path) -> None:
+    export_rows_to_csv(rows, output_path, total=len(rows))
 
 def detect_usb_mount() -> Path | None:
     possible_mounts = [Path("/mnt/usb"), Path("/media/pi")]
@@ -22,7 +74,7 @@ def detect_usb_mount() -> Path | None:
     for base in possible_mounts:
         if not base.exists():
             continue
-      
+
         if base.is_dir() and any(base.iterdir()):
             return base
 
@@ -31,4 +83,4 @@ def detect_usb_mount() -> Path | None:
                 if sub.is_dir():
                     return sub
 
-    return None      
\ No newline at end of file
+    return None
@@ -0,0 +1,102 @@
+import csv
+
+from . import tracing
+from .db import parse_purchase_day
+
+IMPORT_FIELDS = ["name", "category", "purchase_date", "serial_number", "description"]
+
+# te same limity co w formularzu GUI
+MAX_NAME_LEN = 100
+MAX_SERIAL_LEN = 100
+MAX_DESCRIPTION_LEN = 255
+# raport nie rośnie bez końca przy zupełnie złym pliku
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportCancelled(Exception):
+    """Import przerwany – zatwierdzone dotąd paczki pozostają w bazie."""
+
+
+def validate_row(row: dict) -> tuple[dict | None, str | None]:
+    """Zwraca (wiersz gotowy do zapisu, None) albo (None, opis błędu)."""
+    clean = {field: (row.get(field) or "").strip() for field in IMPORT_FIELDS}
+    if not clean["name"]:
+        return None, "brak nazwy"
+    if len(clean["name"]) > MAX_NAME_LEN:
+        return None, f"nazwa dłuższa niż {MAX_NAME_LEN} znaków"
+    if len(clean["serial_number"]) > MAX_SERIAL_LEN:
+        return None, f"numer seryjny dłuższy niż {MAX_SERIAL_LEN} znaków"
+    if len(clean["description"]) > MAX_DESCRIPTION_LEN:
+        return None, f"opis dłuższy niż {MAX_DESCRIPTION_LEN} znaków"
+    if clean["purchase_date"] and parse_purchase_day(clean["purchase_date"]) is None:
+        return None, f"niepoprawna data zakupu: {clean['purchase_date']!r} (oczekiwano RRRR-MM-DD)"
+    return clean, None
+
+
+def import_csv(db, lines, batch_size: int = 1000, progress=None, cancel_event=None) -> dict:
+    """
+    Import CSV strumieniowo: plik jest czytany wiersz po wierszu, walidowany
+    i zapisywany paczkami (jedna transakcja executemany na paczkę), więc
+    pamięć nie zależy od wielkości pliku. Wiersze z istniejącym numerem
+    seryjnym aktualizują wpis zamiast go dublować. Gdy numer seryjny powtarza
+    się w pliku, zostaje ostatni wiersz, a wcześniejsze trafiają do raportu
+    błędów (pamiętamy tylko numery seryjne i numery wierszy, nie całe wiersze).
+
+    `lines` – dowolny iterowalny obiekt tekstowy (otwarty plik, strumień).
+    progress(processed_rows) wołane po każdej paczce.
+    """
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or "name" not in [f.strip() for f in reader.fieldnames]:
+        raise ValueError("Plik CSV musi mieć wiersz nagłówka z kolumną 'name'.")
+    reader.fieldnames = [f.strip() for f in reader.fieldnames]
+
+    report = {"rows": 0, "inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+    batch: list[dict] = []
+    # numer seryjny -> wiersz pliku, który go ostatnio ustawił
+    serial_lines: dict[str, int] = {}
+    last_seq = None
+    # cały import to jedna zmiana z punktu widzenia klientów – jeden ślad
+    trace = tracing.start()
+
+    def add_error(line: int, error: str):
+        report["error_count"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line, "error": error})
+
+    def flush():
+        nonlocal last_seq
+        if not batch:
+            return
+        result = db.upsert_items(batch, notify=False, trace=trace)
+        report["inserted"] += result["inserted"]
+        report["updated"] += result["updated"]
+        last_seq = result["seq"]
+        batch.clear()
+        if progress is not None:
+            progress(report["rows"])
+
+    try:
+        for row in reader:
+            report["rows"] += 1
+            clean, error = validate_row(row)
+            if error is not None:
+                add_error(reader.line_num, error)
+                continue
+            serial = clean["serial_number"]
+            if serial:
+                previous = serial_lines.get(serial)
+                if previous is not None:
+                    # wcześniejszy wiersz nadpisany (w tej paczce) albo zaktualizowany tym (w kolejnej)
+                    add_error(previous, f"duplikat numeru seryjnego w pliku (zastąpiony wierszem {reader.line_num})")
+                serial_lines[serial] = reader.line_num
+            batch.append(clean)
+            if len(batch) >= batch_size:
+                flush()
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled()
+        flush()
+    finally:
+        # jedno powiadomienie na cały import, nie na każdą paczkę
+        if last_seq is not None:
+            db.notify_bulk_change("import", last_seq, trace)
+    return report
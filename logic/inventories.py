@@ -0,0 +1,318 @@
+import asyncio
+import re
+import time
+from pathlib import Path
+
+from . import tracing
+from .broadcast import ChangeBroadcaster
+from .config import INVENTORY_IDLE_TIMEOUT, REPLICATION_PEERS
+from .db import Database
+from .events import create_event_bus
+from .executor import DatabaseExecutor
+from .maintenance import MaintenanceScheduler
+from .read_model import InventoryCache
+from .replication import Replicator
+from .subscriptions import SubscriptionIndex
+from . import wire
+
+# magazyn obsługiwany przez GUI i dotychczasowe ścieżki bez prefiksu (/items, /ws, ...)
+DEFAULT_INVENTORY = "default"
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def validate_inventory_name(name: str) -> str:
+    """Nazwa magazynu trafia do nazwy pliku – tylko litery, cyfry, '_' i '-'."""
+    if not _NAME_RE.match(name or ""):
+        raise ValueError("Nazwa magazynu: 1–64 znaki, litery, cyfry, '_' lub '-'.")
+    return name
+
+
+class Inventory:
+    """
+    Jeden magazyn: własny plik SQLite, pamięć podręczna, szyna zdarzeń,
+    okno łączenia zdarzeń, klienci WebSocket i pula wątków zapisu.
+    Obciążenie jednego magazynu nie blokuje innych (osobne pliki i wątki).
+    """
+
+    def __init__(self, name: str, db_path: Path):
+        self.name = name
+        # zapisy wykonywane przez serwer rozgłaszamy bezpośrednio, bez notify_reload do samego siebie
+        self.db = Database(db_path, on_change=self.publish_change)
+        # szyna zdarzeń: przy kilku workerach każdy z nich rozsyła zmiany do swoich klientów
+        self.bus = create_event_bus(self.db)
+        # odczyty REST obsługujemy z pamięci; zapisy innych procesów wykrywa data_version
+        self.cache = InventoryCache(self.db)
+        # blokujące zapisy z handlerów async idą do osobnej puli, nie na pętlę zdarzeń
+        self.executor = DatabaseExecutor()
+        # zdarzenia z krótkiego okna łączymy w jedną wiadomość (ważne przy seriach skanów)
+        self.broadcaster = ChangeBroadcaster(self._send_change)
+        # klient WebSocket -> wynegocjowany protokół (None = JSON tekstowy, dotychczasowi klienci)
+        self.clients: dict = {}
+        # filtry klientów (kategorie, zakresy id) – rozsyłamy tylko pasujące zmiany
+        self.subscriptions = SubscriptionIndex()
+        # long-poll (/changes/wait): numer ostatniej zmiany i warunek, na którym czekają żądania –
+        # czekające żądania nie zużywają CPU, dopóki zmiana nie obudzi ich wszystkich naraz
+        self.last_seq = 0
+        self.changed = asyncio.Condition()
+        self._wake_pending = False
+        # odpowiedzi dla czekających z tym samym `since` – jedna zmiana budzi ich wielu naraz
+        self._changes_after: dict = {}
+        # stan bieżącej / ostatniej kopii zapasowej (jedna naraz)
+        self.backup_state: dict = {"status": "idle"}
+        self.backup_task: asyncio.Task | None = None
+        # bezczynność: trwające żądania i czas ostatniego użycia
+        self.active = 0
+        self.last_used = time.monotonic()
+        self.started = False
+        # replikacja z sąsiednimi węzłami (REPLICATION_PEERS) – ten sam magazyn po drugiej stronie
+        self.replicator: Replicator | None = None
+        if REPLICATION_PEERS:
+            path = "" if name == DEFAULT_INVENTORY else f"/inventories/{name}"
+            self.replicator = Replicator(self.db, REPLICATION_PEERS, path=path)
+        # optimize / vacuum / checkpoint / integralność, gdy nikt nie pisze
+        self.maintenance = MaintenanceScheduler(self.db)
+
+    async def start(self):
+        self.last_seq = await asyncio.to_thread(self.db.last_change_seq)
+        await self.bus.start(self._dispatch_change)
+        if self.replicator is not None:
+            self.replicator.start()
+        self.maintenance.start()
+        self.started = True
+
+    async def close(self):
+        if self.started:
+            if self.replicator is not None:
+                await asyncio.to_thread(self.replicator.stop)
+            await asyncio.to_thread(self.maintenance.stop)
+            await self.bus.stop()
+            self.started = False
+        self.broadcaster.flush()
+        # czeka na trwające zapisy – poza pętlą, żeby wolny zapis nie wstrzymał serwera
+        await asyncio.to_thread(self.executor.shutdown)
+        self.cache.close()
+        self.db.close()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def is_idle(self, timeout: float) -> bool:
+        busy = self.active or self.clients or self.backup_state.get("status") == "running"
+        return not busy and time.monotonic() - self.last_used >= timeout
+
+    # -------------------- rozsyłanie zmian --------------------
+    async def broadcast(self, message: dict, routing: dict | None = None, traces_by_id: dict | None = None):
+        """
+        Wysyła wiadomość do aktywnych klientów tego magazynu (każdy w swoim protokole).
+        Klient z subskrypcją dostaje tylko pasujące zmiany i ich ślady, a gdy żadna nie pasuje – nic.
+        `routing` (id -> kategorie) i `traces_by_id` (id -> ślady) pochodzą z merge_events;
+        bez `routing` wiadomość idzie do wszystkich.
+        """
+        changes = message.get("changes") or []
+        subscriptions = self.subscriptions
+        targets = None
+        if routing is not None and subscriptions.subscriptions:
+            targets = subscriptions.route(changes, routing, bool(message.get("full")))
+        stats = subscriptions.stats
+        stats["messages"] += 1
+        encoded: dict = {}
+        stale_clients = []
+        for ws, protocol in list(self.clients.items()):
+            if protocol not in encoded:
+                # kodujemy raz na protokół, nie raz na klienta
+                encoded[protocol] = wire.encode(message, protocol)
+            data = encoded[protocol]
+            count = len(changes)
+            stats["deliveries_unfiltered"] += 1
+            stats["changes_unfiltered"] += count
+            stats["bytes_unfiltered"] += len(data)
+            if targets is not None and ws in subscriptions.subscriptions:
+                indices = targets.get(ws)
+                if not indices:
+                    continue
+                if len(indices) < len(changes):
+                    key = (protocol, tuple(indices))
+                    if key not in encoded:
+                        encoded[key] = wire.encode(self._filtered(message, indices, traces_by_id), protocol)
+                    data = encoded[key]
+                    count = len(indices)
+            try:
+                if isinstance(data, bytes):
+                    await ws.send_bytes(data)
+                else:
+                    await ws.send_text(data)
+            except Exception:
+                stale_clients.append(ws)
+                continue
+            stats["deliveries"] += 1
+            stats["changes_sent"] += count
+            stats["bytes_sent"] += len(data)
+        for ws in stale_clients:
+            self.clients.pop(ws, None)
+            subscriptions.unsubscribe(ws)
+
+    @staticmethod
+    def _filtered(message: dict, indices: list[int], traces_by_id: dict | None) -> dict:
+        changes = [message["changes"][i] for i in indices]
+        filtered = {**message, "changes": changes}
+        if "traces" in message and traces_by_id is not None:
+            traces = list(dict.fromkeys(t for c in changes for t in traces_by_id.get(c["id"], ())))
+            if traces:
+                filtered["traces"] = traces
+            else:
+                del filtered["traces"]
+        return filtered
+
+    async def _send_change(self, message: dict):
+        # mapy routingu zostają w procesie, nie trafiają do klientów
+        internal = ("routing", "traces_by_id")
+        await self.broadcast({k: v for k, v in message.items() if k not in internal},
+                             message.get("routing"), message.get("traces_by_id"))
+        tracing.recorder.record(message.get("traces", ()), "sent")
+
+    def _dispatch_change(self, event: dict):
+        tracing.recorder.record_event(event, "dispatch")
+        # pełny wiersz ("item") jest tylko do użytku wewnątrz procesu
+        self.broadcaster.publish({k: v for k, v in event.items() if k != "item"})
+        self._note_change(event.get("seq"))
+
+    # -------------------- long-poll --------------------
+    def _note_change(self, seq):
+        # wołane w wątku pętli; jedno budzenie na serię zmian, bez czekania na okno łączenia zdarzeń
+        refresh = not isinstance(seq, int)
+        if not refresh:
+            if seq <= self.last_seq:
+                return
+            self.last_seq = seq
+        if not self._wake_pending:
+            self._wake_pending = True
+            asyncio.ensure_future(self._wake_waiters(refresh))
+
+    async def _wake_waiters(self, refresh: bool):
+        if refresh:
+            # zdarzenie bez numeru (np. /notify_reload bez treści) – numer bierzemy z dziennika
+            self.last_seq = max(self.last_seq, await asyncio.to_thread(self.db.last_change_seq))
+        self._wake_pending = False
+        async with self.changed:
+            self.changed.notify_all()
+
+    def _read_changes(self, since: int, limit: int = 1000) -> dict:
+        log = self.db.changes_since(since, limit=limit + 1)
+        # dziennik przycięty, za dużo zmian albo zmiana zbiorcza -> klient pobiera całość
+        full = (not log or log[0]["seq"] != since + 1 or len(log) > limit
+                or any(c["item_id"] is None for c in log))
+        ops: dict = {}
+        if not full:
+            for c in log:
+                # add + update to nadal "add" (jak w wiadomościach WebSocket)
+                if not (ops.get(c["item_id"]) == "add" and c["op"] == "update"):
+                    ops[c["item_id"]] = c["op"]
+        seq = log[-1]["seq"] if log and not full else self.db.last_change_seq()
+        return {"seq": seq, "changes": [{"op": op, "id": item_id} for item_id, op in ops.items()], "full": full}
+
+    async def changes_after(self, since: int) -> dict:
+        """Zmienione id po `since` (jak w wiadomości RELOAD); jeden odczyt dziennika na grupę czekających."""
+        key = (since, self.last_seq)
+        task = self._changes_after.get(key)
+        if task is None:
+            if len(self._changes_after) > 256:
+                self._changes_after.clear()
+            task = self._changes_after[key] = asyncio.ensure_future(asyncio.to_thread(self._read_changes, since))
+        return await asyncio.shield(task)
+
+    async def wait_for_change(self, since: int, timeout: float) -> bool:
+        """Czeka, aż numer zmiany przekroczy `since`; False po upływie `timeout` sekund."""
+        async with self.changed:
+            try:
+                await asyncio.wait_for(self.changed.wait_for(lambda: self.last_seq > since), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def publish_change(self, event: dict):
+        """Rozgłasza zmianę w bazie bez HTTP; można wołać z dowolnego wątku."""
+        tracing.recorder.record_event(event)
+        self.cache.apply(event)
+        self.bus.publish(event)
+
+
+class InventoryRegistry:
+    """
+    Magazyny otwierane leniwie przy pierwszym żądaniu i współdzielone;
+    nieużywane dłużej niż `idle_timeout` są zamykane. Domyślny magazyn
+    (data/inventory.db, ten sam co w GUI) jest otwarty zawsze.
+    """
+
+    def __init__(self, data_dir: Path, idle_timeout: float = INVENTORY_IDLE_TIMEOUT):
+        self.data_dir = Path(data_dir)
+        self.inventories_dir = self.data_dir / "inventories"
+        self.idle_timeout = idle_timeout
+        self._open: dict[str, Inventory] = {}
+        self._lock = asyncio.Lock()
+        self.default = Inventory(DEFAULT_INVENTORY, self.path_for(DEFAULT_INVENTORY))
+        self._open[DEFAULT_INVENTORY] = self.default
+
+    def path_for(self, name: str) -> Path:
+        if name == DEFAULT_INVENTORY:
+            return self.data_dir / "inventory.db"
+        return self.inventories_dir / f"{validate_inventory_name(name)}.db"
+
+    def exists(self, name: str) -> bool:
+        return name in self._open or self.path_for(name).exists()
+
+    def names(self) -> list[dict]:
+        names = {DEFAULT_INVENTORY}
+        if self.inventories_dir.is_dir():
+            names.update(p.stem for p in self.inventories_dir.glob("*.db") if _NAME_RE.match(p.stem))
+        return [{"name": n, "open": n in self._open} for n in sorted(names)]
+
+    async def start(self):
+        await self.default.start()
+
+    async def get(self, name: str, create: bool = False) -> Inventory:
+        """Otwarty magazyn; KeyError, gdy nie istnieje (i create=False), ValueError przy złej nazwie."""
+        inventory = self._open.get(name)
+        if inventory is not None:
+            inventory.touch()
+            return inventory
+        path = self.path_for(name)
+        async with self._lock:
+            inventory = self._open.get(name)
+            if inventory is None:
+                if not create and not path.exists():
+                    raise KeyError(name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # schemat / migracje to blokujące I/O – poza pętlą zdarzeń
+                inventory = await asyncio.to_thread(Inventory, name, path)
+                await inventory.start()
+                self._open[name] = inventory
+                print(f"Otwarto magazyn {name!r}")
+        inventory.touch()
+        return inventory
+
+    async def close_idle(self):
+        for name, inventory in list(self._open.items()):
+            if inventory is self.default or not inventory.is_idle(self.idle_timeout):
+                continue
+            async with self._lock:
+                if self._open.get(name) is inventory and inventory.is_idle(self.idle_timeout):
+                    del self._open[name]
+                    await inventory.close()
+                    print(f"Zamknięto nieużywany magazyn {name!r}")
+
+    async def run_idle_closer(self):
+        interval = max(1.0, min(30.0, self.idle_timeout / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.close_idle()
+            except Exception as e:
+                print("Błąd zamykania nieużywanych magazynów:", e)
+
+    async def close_all(self):
+        async with self._lock:
+            for name, inventory in list(self._open.items()):
+                await inventory.close()
+                if inventory is not self.default:
+                    del self._open[name]
@@ -0,0 +1,241 @@
+import json
+import sqlite3
+import threading
+import time
+
+from .config import (
+    MAINTENANCE_CHECKPOINT_INTERVAL,
+    MAINTENANCE_IDLE_SECONDS,
+    MAINTENANCE_INTEGRITY_INTERVAL,
+    MAINTENANCE_OPTIMIZE_INTERVAL,
+    MAINTENANCE_SLICE_PAGES,
+    MAINTENANCE_VACUUM_INTERVAL,
+)
+from .db import _is_locked_error
+
+try:
+    import fcntl
+except ImportError:  # Windows – bez blokady pliku, konserwację prowadzi każdy proces
+    fcntl = None
+
+# ile najwyżej czekać na blokadę w pojedynczym kroku – konserwacja zawsze ustępuje zapisom
+_BUSY_TIMEOUT_MS = 50
+# pełny VACUUM (jednorazowe przejście na auto_vacuum=INCREMENTAL) tylko przy dużej ilości wolnych stron
+_FULL_VACUUM_FREE_RATIO = 0.2
+
+
+class _Interrupted(Exception):
+    """W trakcie zadania pojawił się zapis – dokończymy w następnej bezczynności."""
+
+
+class MaintenanceScheduler:
+    """
+    Konserwacja bazy w czasie bezczynności: gdy przez `idle_seconds` nie było
+    żadnego zapisu (PRAGMA data_version – także z GUI i innych procesów),
+    wykonuje zaległe zadania małymi krokami: checkpoint WAL, PRAGMA optimize /
+    ANALYZE, incremental_vacuum i sprawdzenie integralności (tabela po tabeli).
+    Przed każdym krokiem sprawdza, czy nikt nie pisał; jeśli tak – przerywa.
+
+    Czas ostatniego wykonania i wynik są w tabeli meta, więc przeżywają restart.
+    Konserwację pliku prowadzi jeden proces (blokada <baza>.maintenance.lock):
+    przy kilku workerach pozostałe czekają i przejmują ją, gdy właściciel zniknie.
+    """
+
+    def __init__(self, db, idle_seconds: float = MAINTENANCE_IDLE_SECONDS,
+                 slice_pages: int = MAINTENANCE_SLICE_PAGES, poll_interval: float = 1.0):
+        self.db = db
+        self.idle_seconds = idle_seconds
+        self.slice_pages = slice_pages
+        self.poll_interval = poll_interval
+        # zadanie -> (funkcja, odstęp w sekundach)
+        # checkpoint na końcu – przenosi do pliku bazy także strony zwolnione przez vacuum
+        self.tasks = {
+            "optimize": (self._optimize, MAINTENANCE_OPTIMIZE_INTERVAL * 3600),
+            "vacuum": (self._vacuum, MAINTENANCE_VACUUM_INTERVAL * 3600),
+            "integrity": (self._integrity, MAINTENANCE_INTEGRITY_INTERVAL * 3600),
+            "checkpoint": (self._checkpoint, MAINTENANCE_CHECKPOINT_INTERVAL * 60),
+        }
+        self._conn: sqlite3.Connection | None = None
+        self._data_version = None
+        self._last_write = time.monotonic()
+        self._running: str | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock_file = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # -------------------- stan --------------------
+    def _load(self, conn) -> dict:
+        rows = conn.execute("SELECT key, value FROM meta WHERE key LIKE 'maintenance:%'").fetchall()
+        return {r["key"].split(":", 1)[1]: json.loads(r["value"]) for r in rows}
+
+    def status(self) -> dict:
+        with self.db._connect() as conn:
+            done = self._load(conn)
+        now = time.time()
+        tasks = {}
+        for name, (_, interval) in self.tasks.items():
+            entry = done.get(name, {"last_run": None, "seconds": None, "result": None})
+            last = entry.get("last_run")
+            tasks[name] = {**entry, "next_due": last + interval if last else now}
+        return {
+            "owner": self._lock_file is not None or fcntl is None,
+            "idle": self._is_idle(),
+            "idle_for": round(time.monotonic() - self._last_write, 1),
+            "running": self._running,
+            "tasks": tasks,
+        }
+
+    def _acquire_owner(self) -> bool:
+        """True, gdy ten proces prowadzi konserwację pliku (blokada zwalniana także przy śmierci procesu)."""
+        if self._lock_file is not None or fcntl is None:
+            return True
+        lock_file = open(f"{self.db.db_path}.maintenance.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _is_idle(self) -> bool:
+        return time.monotonic() - self._last_write >= self.idle_seconds
+
+    def _poll(self) -> bool:
+        """Odświeża czas ostatniego zapisu; True, gdy od poprzedniego sprawdzenia ktoś pisał."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self._data_version
+        if changed:
+            self._data_version = version
+            self._last_write = time.monotonic()
+        return changed
+
+    def _step(self):
+        """Punkt kontrolny między krokami zadania: zapis w międzyczasie przerywa zadanie."""
+        if self._stop.is_set() or self._poll():
+            raise _Interrupted()
+
+    # -------------------- zadania --------------------
+    def _checkpoint(self, conn) -> str:
+        busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if busy or done < log:
+            return f"częściowy ({done}/{log} stron)"
+        self._step()
+        # cały WAL przeniesiony – przytnij plik, żeby nie zajmował miejsca na karcie
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return f"ok ({log} stron)"
+
+    def _optimize(self, conn) -> str:
+        # analysis_limit: ANALYZE ogląda próbkę indeksu, więc krok jest krótki także przy dużej tabeli
+        conn.execute("PRAGMA analysis_limit = 400")
+        analysed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+        if analysed is None:
+            conn.execute("ANALYZE")
+            return "ANALYZE"
+        conn.execute("PRAGMA optimize")
+        return "optimize"
+
+    def _vacuum(self, conn) -> str:
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if mode != 2:
+            # baza sprzed włączenia auto_vacuum: jednorazowy pełny VACUUM, tylko gdy warto
+            if not page_count or free / page_count < _FULL_VACUUM_FREE_RATIO:
+                return f"pominięto ({free} wolnych stron)"
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return f"pełny VACUUM, zwolniono {free} stron"
+        released = 0
+        while free:
+            self._step()
+            conn.execute(f"PRAGMA incremental_vacuum({int(self.slice_pages)})").fetchall()
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            released += free - left
+            if left >= free:
+                break
+            free = left
+        return f"zwolniono {released} stron"
+
+    def _integrity(self, conn) -> str:
+        tables = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        problems = []
+        for table in tables:
+            self._step()
+            rows = [r[0] for r in conn.execute(f'PRAGMA integrity_check("{table}")')]
+            if rows != ["ok"]:
+                problems.extend(rows)
+        if problems:
+            print("Sprawdzenie integralności bazy:", "; ".join(problems[:10]))
+            return "błędy: " + "; ".join(problems[:10])
+        return f"ok ({len(tables)} tabel)"
+
+    # -------------------- pętla --------------------
+    def _run_task(self, name: str, fn) -> bool:
+        self._running = name
+        started = time.monotonic()
+        try:
+            result = fn(self._conn)
+        except _Interrupted:
+            return False
+        except sqlite3.OperationalError as e:
+            if _is_locked_error(e):
+                # baza zajęta – spróbujemy przy następnej bezczynności
+                return False
+            print(f"Konserwacja bazy ({name}): {e}")
+            result = f"błąd: {e}"
+        finally:
+            self._running = None
+        entry = {"last_run": time.time(), "seconds": round(time.monotonic() - started, 3), "result": result}
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (f"maintenance:{name}", json.dumps(entry)),
+        )
+        return True
+
+    def run_due(self):
+        """Wykonuje zaległe zadania, dopóki baza jest bezczynna."""
+        done = self._load(self._conn)
+        now = time.time()
+        for name, (fn, interval) in self.tasks.items():
+            last = done.get(name, {}).get("last_run")
+            if last is not None and now - last < interval:
+                continue
+            if self._stop.is_set() or self._poll() or not self._is_idle():
+                return
+            if not self._run_task(name, fn):
+                return
+
+    def _run(self):
+        self._conn = self.db._get_conn()
+        self._conn.execute(f"PRAGMA busy_timeout = {_BUSY_TIMEOUT_MS}")
+        self._poll()
+        try:
+            while not self._stop.wait(self.poll_interval):
+                if not self._acquire_owner():
+                    continue
+                self._poll()
+                if self._is_idle():
+                    try:
+                        self.run_due()
+                    except sqlite3.Error as e:
+                        print("Błąd konserwacji bazy:", e)
+        finally:
+            self._conn.close()
+            self._conn = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
@@ -0,0 +1,169 @@
+import sqlite3
+import threading
+
+from .digest import RangeDigest
+
+
+class InventoryCache:
+    """
+    Migawka inwentarza w pamięci serwera, indeksowana po id, numerze seryjnym i kategorii.
+
+    Zapisy tego procesu aktualizują ją bezpośrednio (apply), a zapisy innych
+    procesów (GUI, inne workery) są wykrywane przez PRAGMA data_version
+    i doczytywane na podstawie change_log. `version` to numer ostatniej
+    uwzględnionej zmiany z dziennika.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.version = 0
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection | None = None
+        self._data_version = None
+        self._loaded = False
+        self.by_id: dict[int, dict] = {}
+        self.by_serial: dict[str, set[int]] = {}
+        self.by_category: dict[str, set[int]] = {}
+        # sumy kontrolne zakresów id – klient po długiej przerwie porównuje je zamiast pobierać całość
+        self.digest = RangeDigest()
+        # numer ostatniej zmiany uwzględnionej dla danego wiersza (chroni przed nadpisaniem nowszych danych starszymi)
+        self._row_seq: dict[int, int] = {}
+
+    # -------------------- indeksy --------------------
+    def _index(self, item: dict):
+        self.by_id[item["id"]] = item
+        self.digest.add(item)
+        sn = item.get("serial_number") or ""
+        if sn:
+            self.by_serial.setdefault(sn, set()).add(item["id"])
+        self.by_category.setdefault(item.get("category") or "", set()).add(item["id"])
+
+    def _unindex(self, item_id: int):
+        old = self.by_id.pop(item_id, None)
+        if old is None:
+            return
+        self.digest.remove(old)
+        sn = old.get("serial_number") or ""
+        ids = self.by_serial.get(sn)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del self.by_serial[sn]
+        ids = self.by_category.get(old.get("category") or "")
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del self.by_category[old.get("category") or ""]
+
+    def _put(self, item_id: int, item: dict | None):
+        self._unindex(item_id)
+        if item is not None:
+            self._index(item)
+
+    # -------------------- synchronizacja z bazą --------------------
+    def _reload(self):
+        # numer zmiany odczytujemy przed wierszami: zmiany zapisane w międzyczasie zostaną doczytane ponownie
+        version = self.db.last_change_seq()
+        items = self.db.list_items()
+        self.by_id, self.by_serial, self.by_category = {}, {}, {}
+        self.digest = RangeDigest(self.digest.leaf)
+        self._row_seq = {}
+        for item in items:
+            self._index(item)
+        self.version = version
+        self._loaded = True
+
+    def _catch_up(self):
+        limit = 10000
+        changes = self.db.changes_since(self.version, limit=limit)
+        if not changes:
+            return
+        # dziennik przycięty, zbyt wiele zmian lub zmiana zbiorcza (bez id) -> pełne przeładowanie
+        if (changes[0]["seq"] != self.version + 1 or len(changes) == limit
+                or any(c["item_id"] is None for c in changes)):
+            self._reload()
+            return
+        last_seq = {c["item_id"]: c["seq"] for c in changes}
+        fresh = {item["id"]: item for item in self.db.get_items(last_seq)}
+        for item_id, seq in last_seq.items():
+            self._put(item_id, fresh.get(item_id))
+            self._row_seq[item_id] = seq
+        self.version = changes[-1]["seq"]
+
+    def _ensure_fresh(self):
+        if self._conn is None:
+            self._conn = self.db._get_conn()
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if not self._loaded:
+            self._data_version = version
+            self._reload()
+        elif version != self._data_version:
+            self._data_version = version
+            self._catch_up()
+
+    def apply(self, event: dict):
+        """Uwzględnia zmianę zapisaną przez ten proces (ta sama ścieżka co zapis)."""
+        with self._lock:
+            if not self._loaded:
+                return
+            item_id = event.get("id")
+            if item_id is None:
+                self._reload()
+                return
+            seq = event.get("seq") or 0
+            if seq <= self.version or seq <= self._row_seq.get(item_id, 0):
+                return  # już uwzględnione przez doczytanie z dziennika
+            if event.get("op") == "delete":
+                self._put(item_id, None)
+            elif "item" in event:
+                self._put(item_id, event["item"])
+            else:
+                fresh = self.db.get_items([item_id])
+                self._put(item_id, fresh[0] if fresh else None)
+            self._row_seq[item_id] = seq
+            if seq == self.version + 1:
+                self.version = seq
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -------------------- odczyty --------------------
+    def list_items(self, category: str | None = None) -> list[dict]:
+        with self._lock:
+            self._ensure_fresh()
+            if category is None:
+                ids = self.by_id.keys()
+            else:
+                ids = self.by_category.get(category, ())
+            return [self.by_id[i] for i in sorted(ids)]
+
+    def get(self, item_id: int) -> dict | None:
+        with self._lock:
+            self._ensure_fresh()
+            return self.by_id.get(item_id)
+
+    def get_many(self, ids) -> list[dict]:
+        with self._lock:
+            self._ensure_fresh()
+            return [self.by_id[i] for i in ids if i in self.by_id]
+
+    def digest_summary(self, lo: int = 0, hi: int | None = None, parts: int = 16) -> dict:
+        with self._lock:
+            self._ensure_fresh()
+            return {**self.digest.summary(lo, hi, parts), "seq": self.version}
+
+    def items_in_range(self, lo: int, hi: int) -> list[dict]:
+        with self._lock:
+            self._ensure_fresh()
+            if hi - lo <= len(self.by_id):
+                return [self.by_id[i] for i in range(lo, hi) if i in self.by_id]
+            return [self.by_id[i] for i in sorted(self.by_id) if lo <= i < hi]
+
+    def get_by_serial(self, serial_number: str) -> dict | None:
+        with self._lock:
+            self._ensure_fresh()
+            ids = self.by_serial.get(serial_number)
+            return self.by_id[min(ids)] if ids else None
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import requests
+
+from .config import REPLICATION_BATCH, REPLICATION_POLL_INTERVAL, REPLICATION_PULL_INTERVAL
+
+
+class Replicator:
+    """
+    Wymiana zmian z sąsiednimi węzłami przez HTTP:
+    - push: lokalna zmiana (wykryta przez PRAGMA data_version, także z GUI)
+      jest od razu wysyłana paczką do POST /replication/apply każdego sąsiada,
+    - pull: co `pull_interval` pobieramy GET /replication/changes – to nadrabia
+      zmiany po przerwie w sieci, także gdy sąsiad nie mógł nam ich wysłać.
+    Kursory (rseq, uid) dla każdego sąsiada są w bazie, więc przetrwają restart.
+    """
+
+    def __init__(self, db, peers: list[str], path: str = "",
+                 batch: int = REPLICATION_BATCH,
+                 poll_interval: float = REPLICATION_POLL_INTERVAL,
+                 pull_interval: float = REPLICATION_PULL_INTERVAL):
+        self.db = db
+        self.peers = peers
+        self.path = path  # np. "/inventories/hala2" dla magazynu innego niż domyślny
+        self.batch = batch
+        self.poll_interval = poll_interval
+        self.pull_interval = pull_interval
+        self._session = requests.Session()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # identyfikatory węzłów sąsiadów – ich własnych zmian nie odsyłamy z powrotem
+        self._peer_nodes: dict[str, str] = {}
+        self._status: dict[str, dict] = {peer: {"peer": peer, "last_push": None, "last_pull": None, "error": None}
+                                         for peer in peers}
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replication", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self) -> dict:
+        peers = []
+        for peer in self.peers:
+            cursors = self.db.get_peer_cursors(peer)
+            peers.append({**self._status[peer], "node": self._peer_nodes.get(peer),
+                          "pushed_seq": cursors["pushed_seq"], "pulled_seq": cursors["pulled_seq"]})
+        return {"node": self.db.node_id, "peers": peers}
+
+    def _url(self, peer: str, endpoint: str) -> str:
+        return f"{peer}{self.path}/replication/{endpoint}"
+
+    # -------------------- push --------------------
+    def push(self, peer: str) -> int:
+        """Wysyła sąsiadowi wszystko po kursorze; zwraca liczbę wysłanych zmian."""
+        cursors = self.db.get_peer_cursors(peer)
+        seq, uid = cursors["pushed_seq"], cursors["pushed_uid"]
+        sent = 0
+        while True:
+            changes = self.db.replication_changes(seq, uid, self.batch)
+            if not changes:
+                break
+            peer_node = self._peer_nodes.get(peer)
+            outgoing = [c for c in changes if c["origin"] != peer_node]
+            if outgoing:
+                resp = self._session.post(self._url(peer, "apply"),
+                                          json={"node": self.db.node_id, "changes": outgoing}, timeout=5)
+                resp.raise_for_status()
+                self._peer_nodes[peer] = resp.json().get("node")
+                sent += len(outgoing)
+            seq, uid = changes[-1]["rseq"], changes[-1]["uid"]
+            self.db.set_peer_cursor(peer, "pushed", seq, uid)
+            if len(changes) < self.batch:
+                break
+        if sent:
+            self._status[peer]["last_push"] = time.time()
+        return sent
+
+    # -------------------- pull --------------------
+    def pull(self, peer: str) -> int:
+        """Pobiera i stosuje zmiany sąsiada po kursorze; zwraca liczbę zastosowanych."""
+        cursors = self.db.get_peer_cursors(peer)
+        seq, uid = cursors["pulled_seq"], cursors["pulled_uid"]
+        applied = 0
+        while True:
+            resp = self._session.get(self._url(peer, "changes"),
+                                     params={"since_seq": seq, "since_uid": uid, "limit": self.batch}, timeout=5)
+            resp.raise_for_status()
+            data = resp.json()
+            self._peer_nodes[peer] = data.get("node")
+            changes = data["changes"]
+            if not changes:
+                break
+            # nasze własne zmiany wracające od sąsiada i tak przegrałyby porównanie wersji
+            incoming = [c for c in changes if c["origin"] != self.db.node_id]
+            applied += self.db.apply_replicated(incoming)["applied"]
+            seq, uid = changes[-1]["rseq"], changes[-1]["uid"]
+            self.db.set_peer_cursor(peer, "pulled", seq, uid)
+            if not data.get("more"):
+                break
+        self._status[peer]["last_pull"] = time.time()
+        return applied
+
+    # -------------------- pętla --------------------
+    def _sync(self, peer: str, pull: bool):
+        try:
+            if pull:
+                self.pull(peer)
+            self.push(peer)
+            self._status[peer]["error"] = None
+        except Exception as e:
+            if self._status[peer]["error"] != str(e):
+                print(f"Replikacja z {peer}: {e}")
+            self._status[peer]["error"] = str(e)
+
+    def _run(self):
+        conn = self.db._get_conn()
+        data_version = None
+        next_pull = 0.0
+        try:
+            while not self._stop.is_set():
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                changed = version != data_version
+                data_version = version
+                pull = time.monotonic() >= next_pull
+                if pull:
+                    next_pull = time.monotonic() + self.pull_interval
+                if changed or pull:
+                    for peer in self.peers:
+                        self._sync(peer, pull)
+                self._stop.wait(self.poll_interval)
+        finally:
+            conn.close()
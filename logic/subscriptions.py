@@ -0,0 +1,106 @@
+import time
+from bisect import bisect_right
+
+# maksymalna liczba zakresów id w jednej subskrypcji
+MAX_RANGES = 64
+
+
+class Subscription:
+    """Filtr klienta: kategorie (id, None = bez kategorii) i zakresy id [lo, hi). Pusty = wszystko."""
+
+    def __init__(self, category_ids=(), ranges=()):
+        self.category_ids = set(category_ids)
+        self.ranges = [(int(lo), int(hi)) for lo, hi in ranges if int(hi) > int(lo)]
+
+    def is_empty(self) -> bool:
+        return not self.category_ids and not self.ranges
+
+    def describe(self) -> dict:
+        return {"category_ids": sorted(self.category_ids, key=lambda c: -1 if c is None else c),
+                "ranges": [list(r) for r in self.ranges]}
+
+
+class SubscriptionIndex:
+    """
+    Indeks subskrypcji kanału /ws: kategoria -> gniazda i przedziały elementarne
+    zakresów id -> gniazda (wyszukiwanie bisect). Dla każdej zmiany odbiorców
+    wyznaczamy z indeksu, bez sprawdzania każdego klienta z osobna.
+    Metody wołamy w wątku pętli asyncio serwera.
+    """
+
+    def __init__(self):
+        self.subscriptions: dict = {}  # gniazdo -> Subscription (tylko klienci z filtrem)
+        self.by_category: dict = {}
+        self._bounds: list[int] = []
+        self._segments: list[frozenset] = []
+        # statystyki rozsyłania: z filtrami i ile byłoby bez nich
+        self.stats = {
+            "messages": 0,
+            "deliveries": 0,
+            "deliveries_unfiltered": 0,
+            "changes_sent": 0,
+            "changes_unfiltered": 0,
+            "bytes_sent": 0,
+            "bytes_unfiltered": 0,
+            "route_seconds": 0.0,
+        }
+
+    def subscribe(self, ws, subscription: Subscription):
+        self.unsubscribe(ws)
+        if subscription.is_empty():
+            return
+        self.subscriptions[ws] = subscription
+        for category_id in subscription.category_ids:
+            self.by_category.setdefault(category_id, set()).add(ws)
+        if subscription.ranges:
+            self._rebuild_ranges()
+
+    def unsubscribe(self, ws):
+        subscription = self.subscriptions.pop(ws, None)
+        if subscription is None:
+            return
+        for category_id in subscription.category_ids:
+            sockets = self.by_category.get(category_id)
+            if sockets is not None:
+                sockets.discard(ws)
+                if not sockets:
+                    del self.by_category[category_id]
+        if subscription.ranges:
+            self._rebuild_ranges()
+
+    def _rebuild_ranges(self):
+        # końce wszystkich zakresów dzielą oś id na przedziały elementarne; dla każdego – zbiór gniazd
+        bounds = sorted({b for s in self.subscriptions.values() for r in s.ranges for b in r})
+        segments = []
+        for lo in bounds:
+            segments.append(frozenset(ws for ws, s in self.subscriptions.items()
+                                      if any(a <= lo < b for a, b in s.ranges)))
+        self._bounds, self._segments = bounds, segments
+
+    def _by_range(self, item_id: int) -> frozenset:
+        i = bisect_right(self._bounds, item_id) - 1
+        return self._segments[i] if i >= 0 else frozenset()
+
+    def route(self, changes: list[dict], routing: dict, full: bool) -> dict | None:
+        """
+        Zmiany dla każdego klienta z filtrem: gniazdo -> indeksy pasujących zmian
+        (klienta bez pasujących zmian nie ma w wyniku). Zmiana bez znanej kategorii
+        (np. zapisana przez inny proces) trafia do wszystkich subskrybentów.
+        """
+        if full:
+            return None  # przeładowanie całości – każdy klient dostaje pełną wiadomość
+        started = time.perf_counter()
+        everyone = set(self.subscriptions)
+        targets: dict = {}
+        for index, change in enumerate(changes):
+            category_ids = routing.get(change["id"])
+            if category_ids is None:
+                matched = everyone
+            else:
+                matched = set(self._by_range(change["id"]))
+                for category_id in category_ids:
+                    matched |= self.by_category.get(category_id, set())
+            for ws in matched:
+                targets.setdefault(ws, []).append(index)
+        self.stats["route_seconds"] += time.perf_counter() - started
+        return targets
@@ -0,0 +1,149 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from .config import TRACE_HISTORY, TRACE_LOG
+
+# etapy w kolejności przepływu zmiany; "visible" to potwierdzenie klienta po przeładowaniu widoku
+STAGES = ["request", "commit", "dispatch", "sent"]
+
+_current: contextvars.ContextVar[dict | None] = contextvars.ContextVar("trace", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def begin(trace_id: str | None = None) -> dict:
+    """Otwiera ślad dla bieżącego kontekstu (np. żądania REST); zapisy w nim go przejmą."""
+    trace = {"id": trace_id or new_trace_id(), "request": time.time()}
+    _current.set(trace)
+    return trace
+
+
+def start() -> dict:
+    """Ślad bieżącego żądania albo nowy – każda zmiana w bazie ma swój identyfikator."""
+    trace = _current.get()
+    if trace is not None:
+        return trace
+    return {"id": new_trace_id(), "request": time.time()}
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(_percentile(values, 50), 2),
+        "p95_ms": round(_percentile(values, 95), 2),
+        "max_ms": round(max(values), 2),
+    }
+
+
+class TraceRecorder:
+    """
+    Znaczniki czasu (epoch, s) etapów dla ostatnich `history` zmian w tym procesie.
+    Opóźnienia liczone są od najwcześniejszego znanego etapu (request albo commit).
+    """
+
+    def __init__(self, history: int = TRACE_HISTORY, log: bool = TRACE_LOG):
+        self.history = history
+        self.log = log
+        self._lock = threading.Lock()
+        self._traces: OrderedDict[str, dict] = OrderedDict()
+
+    def _entry(self, trace_id: str) -> dict:
+        entry = self._traces.get(trace_id)
+        if entry is None:
+            entry = {"id": trace_id, "ts": {}, "visible": {}}
+            self._traces[trace_id] = entry
+            while len(self._traces) > self.history:
+                self._traces.popitem(last=False)
+        return entry
+
+    def record_event(self, event: dict, stage: str | None = None, at: float | None = None):
+        """Przejmuje znaczniki ze zdarzenia (pole "trace") i opcjonalnie dopisuje etap."""
+        trace = event.get("trace")
+        if not isinstance(trace, dict) or not trace.get("id"):
+            return
+        with self._lock:
+            entry = self._entry(trace["id"])
+            entry.setdefault("op", event.get("op"))
+            entry.setdefault("item_id", event.get("id"))
+            for name in STAGES:
+                if isinstance(trace.get(name), (int, float)):
+                    entry["ts"].setdefault(name, trace[name])
+            if stage is not None:
+                entry["ts"].setdefault(stage, at if at is not None else time.time())
+
+    def record(self, trace_ids, stage: str, at: float | None = None):
+        at = at if at is not None else time.time()
+        with self._lock:
+            for trace_id in trace_ids:
+                self._entry(trace_id)["ts"].setdefault(stage, at)
+
+    def record_visible(self, trace_ids, client: str, at: float | None = None):
+        """Potwierdzenie klienta: zmiana jest już na jego ekranie."""
+        at = at if at is not None else time.time()
+        lines = []
+        with self._lock:
+            for trace_id in trace_ids:
+                entry = self._traces.get(trace_id)
+                if entry is None or client in entry["visible"]:
+                    continue
+                entry["visible"][client] = at
+                if self.log:
+                    lines.append(self._log_line(entry, client))
+        for line in lines:
+            print(line)
+
+    @staticmethod
+    def _origin(entry: dict) -> float | None:
+        ts = entry["ts"]
+        return ts.get("request", ts.get("commit"))
+
+    def _log_line(self, entry: dict, client: str) -> str:
+        origin = self._origin(entry)
+        parts = [f"{name} +{(entry['ts'][name] - origin) * 1000:.1f} ms"
+                 for name in STAGES if name in entry["ts"] and origin is not None]
+        if origin is not None:
+            parts.append(f"widoczne({client}) +{(entry['visible'][client] - origin) * 1000:.1f} ms")
+        return f"trace {entry['id']} {entry.get('op')}#{entry.get('item_id')}: " + ", ".join(parts)
+
+    def stats(self, recent: int = 20) -> dict:
+        """Percentyle opóźnień etapów, zapis->widoczne (wszyscy klienci i per klient) oraz ostatnie ślady."""
+        with self._lock:
+            entries = [{**e, "ts": dict(e["ts"]), "visible": dict(e["visible"])} for e in self._traces.values()]
+        stages: dict[str, list[float]] = {name: [] for name in STAGES[1:]}
+        visible_all: list[float] = []
+        per_client: dict[str, list[float]] = {}
+        for entry in entries:
+            origin = self._origin(entry)
+            if origin is None:
+                continue
+            for name in stages:
+                if name in entry["ts"]:
+                    stages[name].append((entry["ts"][name] - origin) * 1000)
+            for client, at in entry["visible"].items():
+                ms = (at - origin) * 1000
+                visible_all.append(ms)
+                per_client.setdefault(client, []).append(ms)
+        return {
+            "traces": len(entries),
+            "stages": {name: _summary(values) for name, values in stages.items()},
+            "write_to_visible": _summary(visible_all),
+            "clients": {client: _summary(values) for client, values in per_client.items()},
+            "recent": entries[-recent:] if recent > 0 else [],
+        }
+
+
+# rejestr śladów tego procesu (serwer; w trybie wbudowanym wspólny z GUI)
+recorder = TraceRecorder()
@@ -0,0 +1,210 @@
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:  # opcjonalny – bez niego binarny format struct
+    msgpack = None
+
+# protokoły kanału /ws negocjowane nagłówkiem Sec-WebSocket-Protocol (wersja w nazwie).
+# Klient bez nagłówka (np. obecna aplikacja Flutter) dostaje JSON w ramkach tekstowych.
+PROTOCOL_JSON = "inventory.v2+json"
+PROTOCOL_MSGPACK = "inventory.v2+msgpack"
+PROTOCOL_STRUCT = "inventory.v2+struct"
+LEGACY = None
+
+BINARY_PROTOCOLS = {PROTOCOL_MSGPACK, PROTOCOL_STRUCT}
+
+
+def available_protocols() -> list[str]:
+    """Protokoły obsługiwane w tym procesie, od najbardziej preferowanego."""
+    protocols = [PROTOCOL_MSGPACK] if msgpack is not None else []
+    return protocols + [PROTOCOL_STRUCT, PROTOCOL_JSON]
+
+
+def negotiate(offered) -> str | None:
+    """Pierwszy z protokołów serwera, który klient zaproponował; None = klient dotychczasowy (JSON)."""
+    offered = set(offered or ())
+    for protocol in available_protocols():
+        if protocol in offered:
+            return protocol
+    return LEGACY
+
+
+def client_offer(preferred: str = "auto") -> list[str]:
+    """
+    Lista dla websockets.connect(subprotocols=...): "auto" = MessagePack, gdy zainstalowany,
+    inaczej JSON; "json" = tekst. Format struct tylko na wyraźne żądanie – w czystym Pythonie
+    koduje wolniej niż JSON, a po deflate nie jest mniejszy.
+    """
+    if preferred == "json":
+        return [PROTOCOL_JSON]
+    if preferred in available_protocols():
+        return [preferred, PROTOCOL_JSON] if preferred != PROTOCOL_JSON else [PROTOCOL_JSON]
+    return [PROTOCOL_MSGPACK, PROTOCOL_JSON] if msgpack is not None else [PROTOCOL_JSON]
+
+
+# -------------------- format struct --------------------
+# Każda wartość: bajt typu + dane. Długości i liczby całkowite jako varint (LEB128,
+# liczby ze znakiem w kodowaniu zigzag), więc małe wartości zajmują 1 bajt.
+# Powtarzające się krótkie napisy (klucze wierszy, "update", nazwy kategorii)
+# po pierwszym wystąpieniu są zastępowane numerem w tablicy napisów wiadomości.
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _REF, _LIST, _DICT = b"NTFidsrlm"
+_F64 = struct.Struct("<d")
+_MAX_INTERNED_LEN = 64
+
+
+def _put_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _pack(value, out: bytearray, strings: dict):
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _put_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _F64.pack(value)
+    elif isinstance(value, str):
+        ref = strings.get(value)
+        if ref is not None:
+            out.append(_REF)
+            _put_varint(ref, out)
+            return
+        data = value.encode("utf-8")
+        out.append(_STR)
+        _put_varint(len(data), out)
+        out += data
+        if len(data) <= _MAX_INTERNED_LEN:
+            strings[value] = len(strings)
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _put_varint(len(value), out)
+        for v in value:
+            _pack(v, out, strings)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _put_varint(len(value), out)
+        for k, v in value.items():
+            _pack(str(k), out, strings)
+            _pack(v, out, strings)
+    else:
+        raise TypeError(f"Nieobsługiwany typ w wiadomości: {type(value).__name__}")
+
+
+def _unpack(data: bytes, pos: int, strings: list):
+    tag = data[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _FLOAT:
+        return _F64.unpack_from(data, pos)[0], pos + 8
+    number, pos = _get_varint(data, pos)
+    if tag == _INT:
+        return (number >> 1) ^ -(number & 1), pos
+    if tag == _REF:
+        return strings[number], pos
+    if tag == _STR:
+        if pos + number > len(data):
+            raise ValueError("Ucięta wiadomość")
+        value = data[pos:pos + number].decode("utf-8")
+        if number <= _MAX_INTERNED_LEN:
+            strings.append(value)
+        return value, pos + number
+    if tag == _LIST:
+        items = []
+        for _ in range(number):
+            value, pos = _unpack(data, pos, strings)
+            items.append(value)
+        return items, pos
+    if tag == _DICT:
+        result = {}
+        for _ in range(number):
+            key, pos = _unpack(data, pos, strings)
+            result[key], pos = _unpack(data, pos, strings)
+        return result, pos
+    raise ValueError(f"Nieznany znacznik typu: {tag!r}")
+
+
+def struct_dumps(message) -> bytes:
+    out = bytearray()
+    _pack(message, out, {})
+    return bytes(out)
+
+
+def struct_loads(data: bytes):
+    value, pos = _unpack(data, 0, [])
+    if pos != len(data):
+        raise ValueError("Nadmiarowe bajty po wiadomości")
+    return value
+
+
+# -------------------- kodowanie wiadomości --------------------
+def encode(message: dict, protocol: str | None) -> str | bytes:
+    """Tekst JSON (dotychczasowi klienci i PROTOCOL_JSON) albo bajty dla protokołów binarnych."""
+    if protocol == PROTOCOL_MSGPACK:
+        return msgpack.packb(message)
+    if protocol == PROTOCOL_STRUCT:
+        return struct_dumps(message)
+    return json.dumps(message)
+
+
+def decode(data: str | bytes, protocol: str | None):
+    if protocol == PROTOCOL_MSGPACK:
+        return msgpack.unpackb(data)
+    if protocol == PROTOCOL_STRUCT:
+        return struct_loads(data)
+    return json.loads(data)
+
+
+async def send(websocket, message: dict, protocol: str | None):
+    """Wysyła wiadomość klientowi starlette w jego protokole."""
+    data = encode(message, protocol)
+    if isinstance(data, bytes):
+        await websocket.send_bytes(data)
+    else:
+        await websocket.send_text(data)
+
+
+async def receive(websocket, protocol: str | None):
+    """
+    Następna wiadomość od klienta starlette; None, gdy nie da się jej odczytać
+    (ramka innego typu niż w protokole albo błąd dekodowania). Przy rozłączeniu
+    – WebSocketDisconnect, jak w receive_text/receive_bytes.
+    """
+    from starlette.websockets import WebSocketDisconnect
+
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    data = message.get("bytes") if protocol in BINARY_PROTOCOLS else message.get("text")
+    if data is None:
+        return None
+    try:
+        return decode(data, protocol)
+    except Exception:
+        return None
@@ -1,47 +1,141 @@
 import asyncio
+import random
 import threading
-import json
 import websockets
-from .config import SERVER_HOST, SERVER_PORT
+from . import wire
+from .config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    WS_COMPRESSION,
+    WS_PING_INTERVAL,
+    WS_PING_TIMEOUT,
+    WS_PROTOCOL,
+    WS_RECONNECT_MIN_DELAY,
+    WS_RECONNECT_MAX_DELAY,
+)
 
 class WSListener:
 
-    def __init__(self, on_reload_callback, uri: str | None = None):
+    def __init__(self, on_reload_callback, uri: str | None = None, client_name: str = "gui",
+                 protocol: str = WS_PROTOCOL):
         if uri is None:
             uri = f"ws://{SERVER_HOST}:{SERVER_PORT}/ws"
         self.uri = uri
         self.on_reload_callback = on_reload_callback  # funkcja np. refresh()
+        self.running = False
+        # numer ostatniej odebranej zmiany; po ponownym połączeniu serwer dośle to, co przegapiliśmy
+        self.last_seq: int | None = None
         self.loop = asyncio.new_event_loop()
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._task: asyncio.Task | None = None
+        # nazwa w statystykach opóźnień serwera i ślady czekające na potwierdzenie (ack)
+        self.client_name = client_name
+        self._ws = None
+        # proponowane protokoły kanału (logic/wire.py) i ten wybrany przez serwer po połączeniu
+        self.offer = wire.client_offer(protocol)
+        self.protocol: str | None = None
+        self._pending_traces: list[str] = []
+        self._traces_lock = threading.Lock()
 
     def _run_loop(self):
         asyncio.set_event_loop(self.loop)
         try:
-            self.loop.run_until_complete(self._listen())
+            self.loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
         finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
             self.loop.close()
 
-    async def _listen(self):
+    def _connect_uri(self) -> str:
+        since = self.last_seq if self.last_seq is not None else -1
+        sep = "&" if "?" in self.uri else "?"
+        return f"{self.uri}{sep}since={since}&client={self.client_name}"
+
+    def _reconnect_delay(self, attempt: int) -> float:
+        """Wykładniczy backoff z pełnym losowym rozrzutem."""
+        cap = min(WS_RECONNECT_MAX_DELAY, WS_RECONNECT_MIN_DELAY * (2 ** attempt))
+        return random.uniform(WS_RECONNECT_MIN_DELAY, max(WS_RECONNECT_MIN_DELAY, cap))
+
+    async def _heartbeat(self, ws):
         while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            await ws.send(wire.encode({"type": "ping"}, self.protocol))
+
+    def _handle_message(self, data: dict):
+        seq = data.get("seq")
+        if isinstance(seq, int):
+            self.last_seq = seq if self.last_seq is None else max(self.last_seq, seq)
+        if data.get("event") == "reload":
+            print("Odebrano RELOAD z serwera.")
+            traces = data.get("traces")
+            if traces:
+                with self._traces_lock:
+                    self._pending_traces.extend(traces)
+            self.on_reload_callback()
+
+    async def _listen(self):
+        attempt = 0
+        while self.running:
             try:
-                async with websockets.connect(self.uri) as ws:
-                    print("Aplikacja RPi połączona z WS serwera.")
-                    while True:
-                        msg = await ws.recv()
-                        data = json.loads(msg)
-                        if data.get("event") == "reload":
-                            print("Odebrano RELOAD z serwera.")
-                            self.on_reload_callback()
+                async with websockets.connect(
+                    self._connect_uri(),
+                    close_timeout=1,
+                    subprotocols=self.offer,
+                    compression="deflate" if WS_COMPRESSION else None,
+                ) as ws:
+                    # starszy serwer nie wybierze żadnego protokołu -> JSON tekstowy
+                    self.protocol = ws.subprotocol
+                    print(f"Aplikacja RPi połączona z WS serwera ({self.protocol or 'json'}).")
+                    attempt = 0
+                    self._ws = ws
+                    heartbeat = asyncio.create_task(self._heartbeat(ws))
+                    try:
+                        while True:
+                            # serwer odpowiada na każdy ping, więc cisza dłuższa niż
+                            # interwał + timeout oznacza martwe połączenie
+                            msg = await asyncio.wait_for(ws.recv(), timeout=WS_PING_INTERVAL + WS_PING_TIMEOUT)
+                            self._handle_message(wire.decode(msg, self.protocol))
+                    finally:
+                        self._ws = None
+                        heartbeat.cancel()
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 print("Błąd WS / zerwane połączenie:", e)
-                await asyncio.sleep(5)  # spróbuj ponownie po 5 s
+            delay = self._reconnect_delay(attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def ack(self):
+        """Wołane po przeładowaniu widoku: serwer liczy z tego opóźnienie zapis -> ekran."""
+        with self._traces_lock:
+            traces, self._pending_traces = self._pending_traces, []
+        if not traces:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._send_ack, traces)
+        except RuntimeError:
+            pass  # pętla już zamknięta
+
+    def _send_ack(self, traces: list[str]):
+        ws = self._ws
+        if ws is None:
+            return
+        task = asyncio.ensure_future(ws.send(wire.encode({"type": "ack", "traces": traces}, self.protocol)))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
     def start(self):
+        self.running = True
+        self._task = self.loop.create_task(self._listen())
         self.thread.start()
 
-    def stop(self):
+    def stop(self, timeout: float = 2.0):
         self.running = False
         try:
-            self.loop.call_soon_threadsafe(self.loop.stop)
-        except Exception:
-            pass
\ No newline at end of file
+            if self._task is not None:
+                self.loop.call_soon_threadsafe(self._task.cancel)
+        except RuntimeError:
+            pass  # pętla już zamknięta
+        if self.thread.is_alive():
+            self.thread.join(timeout)
@@ -1,15 +1,17 @@
 import os
 import sys
+import threading
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.QtCore import Qt, QCoreApplication
 from ui.views import MainView
 from logic.ws_client import WSListener
-from logic.config import SERVER_HOST, SERVER_PORT
+from logic.config import SERVER_HOST, SERVER_PORT, EMBEDDED_SERVER
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.ws_listener: WSListener | None = None
+        self.embedded_server = None
 
     def closeEvent(self, event):
         if self.ws_listener is not None:
@@ -17,9 +19,35 @@ class MainWindow(QMainWindow):
                 self.ws_listener.stop()
             except Exception:
                 pass
+        if self.embedded_server is not None:
+            try:
+                self.embedded_server.stop()
+            except Exception:
+                pass
         super().closeEvent(event)
 
 
+def start_embedded_server(window: MainWindow):
+    """Uruchamia wifi_server.app w wątku tła; GUI i serwer dzielą jedną instancję Database."""
+    import wifi_server
+    from logic.embedded import EmbeddedServer
+
+    db = wifi_server.db
+
+    def on_db_change(event: dict):
+        # zapisy z wątku Qt oznaczamy, żeby GUI nie przeładowywało się drugi raz
+        if threading.current_thread() is threading.main_thread():
+            event = {**event, "origin": "gui"}
+        wifi_server.publish_change(event)
+
+    db.on_change = on_db_change
+
+    server = EmbeddedServer(wifi_server.app, host="0.0.0.0", port=SERVER_PORT)
+    server.start()
+    window.embedded_server = server
+    return db
+
+
 def main():
     os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
     QCoreApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
@@ -27,22 +55,46 @@ def main():
 
     app = QApplication(sys.argv)
 
-    window = QMainWindow()
+    window = MainWindow()
     window.setWindowTitle("Rejestr zasobów")
     window.setFixedSize(800, 430)
 
-    main_view = MainView(parent=window)
+    embedded = EMBEDDED_SERVER or "--embedded" in sys.argv
+    db = start_embedded_server(window) if embedded else None
+
+    main_view = MainView(parent=window, db=db)
     window.setCentralWidget(main_view)
 
-    def on_reload():
-        main_view.reload_signal.emit()
-    ws = WSListener(on_reload_callback=on_reload)
-    ws.start()
-    window.ws_listener = ws
+    if embedded:
+        import wifi_server
+
+        from logic import tracing
+
+        pending_traces: list[str] = []
+
+        # zmiany z telefonów docierają do widoku sygnałem Qt, bez WebSocketu
+        def on_change(event: dict):
+            if event.get("origin") != "gui":
+                pending_traces.extend(event.get("traces", ()))
+                main_view.reload_signal.emit()
+        wifi_server.add_local_listener(on_change)
+
+        def on_loaded():
+            traces = pending_traces[:]
+            del pending_traces[:len(traces)]
+            tracing.recorder.record_visible(traces, "gui")
+        main_view.items_loaded.connect(on_loaded)
+    else:
+        def on_reload():
+            main_view.reload_signal.emit()
+        ws = WSListener(on_reload_callback=on_reload)
+        main_view.items_loaded.connect(ws.ack)
+        ws.start()
+        window.ws_listener = ws
 
     window.show()
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,128 @@
+"""
+Czy wolny zapis wstrzymuje odczyty i kanał /ws serwera: uruchamia wifi_server.py
+na tymczasowym katalogu danych, inne połączenie trzyma blokadę zapisu przez
+`--hold` sekund (wolny zapis), a w tym czasie kilka POST /items czeka na nią
+w puli zapisów serwera. Mierzymy w tym czasie GET /items, ping /ws, powitanie
+/ws?since=0 (odczyt dziennika) i po zwolnieniu blokady – dostarczenie zmian
+subskrybentowi /ws.
+
+    python -m scripts.slow_write_check --hold 2 --writes 4
+
+Kod wyjścia 1, gdy któryś odczyt lub ping trwał dłużej niż połowa blokady.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+import websockets
+
+from logic.config import BASE_DIR
+
+_ITEM = {"name": "wolny zapis", "category": "", "purchase_date": "", "serial_number": "", "description": ""}
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {"count": len(ordered), "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def _hold_write_lock(db_path: Path, seconds: float, locked: threading.Event, released: list):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    locked.set()
+    time.sleep(seconds)
+    conn.execute("COMMIT")
+    released.append(time.monotonic())
+    conn.close()
+
+
+async def _measure(url: str, ws_url: str, db_path: Path, hold: float, writes: int) -> dict:
+    reads, pings, hellos, delivered = [], [], [], []
+    async with websockets.connect(ws_url) as subscriber, websockets.connect(ws_url) as pinger:
+        locked, released = threading.Event(), []
+        holder = threading.Thread(target=_hold_write_lock, args=(db_path, hold, locked, released))
+        holder.start()
+        await asyncio.to_thread(locked.wait)
+        posts = [asyncio.create_task(asyncio.to_thread(requests.post, f"{url}/items", json=_ITEM, timeout=60))
+                 for _ in range(writes)]
+        await asyncio.sleep(0.1)  # zapisy serwera czekają już na blokadę
+        while holder.is_alive():
+            started = time.monotonic()
+            await asyncio.to_thread(requests.get, f"{url}/items", timeout=60)
+            reads.append(time.monotonic() - started)
+
+            started = time.monotonic()
+            await pinger.send(json.dumps({"type": "ping"}))
+            while json.loads(await pinger.recv()).get("type") != "pong":
+                pass
+            pings.append(time.monotonic() - started)
+
+            started = time.monotonic()
+            async with websockets.connect(f"{ws_url}?since=0") as fresh:
+                await fresh.recv()  # {"type": "hello", "seq": ...}
+            hellos.append(time.monotonic() - started)
+            await asyncio.sleep(0.05)
+        holder.join()
+        await asyncio.gather(*posts)
+        # zmiany z zapisów, które czekały na blokadę
+        received = 0
+        while received < writes:
+            message = json.loads(await asyncio.wait_for(subscriber.recv(), 10))
+            if message.get("event") == "reload":
+                received += len(message.get("changes") or [None])
+                delivered.append(time.monotonic() - released[0])
+    return {"get_items": _summary(reads), "ws_ping": _summary(pings), "ws_hello": _summary(hellos),
+            "ws_delivery_after_release": _summary(delivered)}
+
+
+def run(hold: float = 2.0, writes: int = 4, port: int = 8765) -> dict:
+    data_dir = Path(tempfile.mkdtemp(prefix="slow_write_"))
+    env = dict(os.environ, DATA_DIR=str(data_dir), SERVER_PORT=str(port), SERVER_WORKERS="1")
+    server = subprocess.Popen([sys.executable, "wifi_server.py"], cwd=BASE_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{url}/ping", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        for i in range(200):
+            requests.post(f"{url}/items", json={**_ITEM, "name": f"wpis {i}"}, timeout=10)
+        return asyncio.run(_measure(url, f"ws://127.0.0.1:{port}/ws", data_dir / "inventory.db", hold, writes))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Odczyty i /ws w czasie wolnego zapisu")
+    parser.add_argument("--hold", type=float, default=2.0, help="jak długo trzymać blokadę zapisu (s)")
+    parser.add_argument("--writes", type=int, default=4, help="ile POST /items czeka na blokadę")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    result = run(args.hold, args.writes, args.port)
+    for name, stats in result.items():
+        print(f"{name:<27} {stats}")
+    limit_ms = args.hold * 1000 / 2
+    blocked = [name for name in ("get_items", "ws_ping", "ws_hello") if result[name].get("max_ms", 0) > limit_ms]
+    if blocked:
+        print("Wstrzymane przez wolny zapis:", ", ".join(blocked))
+    sys.exit(1 if blocked else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Zapisy z wielu procesów naraz do jednego pliku SQLite (GUI, workery serwera,
+skrypty): każdy proces w tej samej chwili otwiera własny Database (schemat,
+tryb WAL) i dodaje wpisy. Na końcu liczba utraconych wpisów i czasy zapisu.
+
+    python -m scripts.stress_db --writers 8 --rows 200
+    python -m scripts.stress_db --busy-timeout-ms 1 --retries 20   # ponowienia zamiast czekania
+
+Kod wyjścia 1, gdy jakiś zapis się nie powiódł albo zaginął albo p99 czasu
+zapisu przekroczył --max-p99-ms.
+"""
+import argparse
+import multiprocessing
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from logic.config import DB_BUSY_TIMEOUT_MS, DB_WRITE_RETRIES
+from logic.db import Database
+
+
+def _writer(path: str, writer: int, rows: int, busy_timeout_ms: int, retries: int, start, results):
+    start.wait()  # wszystkie procesy otwierają bazę równocześnie
+    latencies, failed = [], 0
+    try:
+        db = Database(path, busy_timeout_ms=busy_timeout_ms, write_retries=retries, on_change=lambda event: None)
+    except sqlite3.Error as e:
+        print(f"proces {writer}: nie udało się otworzyć bazy: {e}")
+        results.put((0, rows, []))
+        return
+    for i in range(rows):
+        started = time.perf_counter()
+        try:
+            db.add_item(f"stress {writer}-{i}", "stress", "", f"ST-{writer}-{i}", "")
+        except sqlite3.Error as e:
+            failed += 1
+            print(f"proces {writer}: zapis {i} nieudany: {e}")
+            continue
+        latencies.append(time.perf_counter() - started)
+    results.put((rows - failed, failed, latencies))
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1))))]
+
+
+def run(writers: int, rows: int, busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS, retries: int = DB_WRITE_RETRIES,
+        path: str | None = None) -> dict:
+    if path is None:
+        path = str(Path(tempfile.mkdtemp(prefix="stress_db_")) / "stress.db")
+    ctx = multiprocessing.get_context("spawn")
+    start = ctx.Barrier(writers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_writer, args=(path, w, rows, busy_timeout_ms, retries, start, results))
+             for w in range(writers)]
+    for p in procs:
+        p.start()
+    committed, failed, latencies = 0, 0, []
+    for _ in procs:
+        ok, bad, times = results.get()
+        committed, failed = committed + ok, failed + bad
+        latencies += times
+    for p in procs:
+        p.join()
+    with sqlite3.connect(path) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM inventory WHERE serial_number LIKE 'ST-%'").fetchone()[0]
+    return {
+        "path": path,
+        "expected": writers * rows,
+        "committed": committed,
+        "failed": failed,
+        "stored": stored,
+        "lost": committed - stored,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Równoległe zapisy z wielu procesów do jednej bazy SQLite")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--busy-timeout-ms", type=int, default=DB_BUSY_TIMEOUT_MS, help="krótki timeout wymusza ponowienia")
+    parser.add_argument("--retries", type=int, default=DB_WRITE_RETRIES)
+    parser.add_argument("--max-p99-ms", type=float, default=1000,
+                        help="górna granica p99 czasu zapisu (ms); 0 = bez sprawdzania")
+    parser.add_argument("--db", help="plik bazy (domyślnie nowy w katalogu tymczasowym)")
+    args = parser.parse_args()
+    result = run(args.writers, args.rows, args.busy_timeout_ms, args.retries, args.db)
+    for key, value in result.items():
+        print(f"{key:<10} {value}")
+    slow = bool(args.max_p99_ms) and result["p99_ms"] is not None and result["p99_ms"] > args.max_p99_ms
+    if slow:
+        print(f"p99 {result['p99_ms']} ms powyżej progu {args.max_p99_ms} ms")
+    sys.exit(1 if result["failed"] or result["lost"] or slow else 0)
+
+
+if __name__ == "__main__":
+    main()
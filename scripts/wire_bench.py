@@ -0,0 +1,81 @@
+"""
+Porównanie formatów kanału /ws: rozmiar wiadomości (surowy i po deflate,
+jak przy permessage-deflate) oraz czas kodowania / dekodowania.
+
+    python -m scripts.wire_bench
+"""
+import time
+import uuid
+import zlib
+
+from logic import wire
+
+
+def _sample_messages() -> dict[str, dict]:
+    trace = uuid.uuid4().hex[:16]
+    rows = [
+        {
+            "id": i, "name": f"Laptop Dell Latitude {i}", "category": "IT", "purchase_date": "2024-03-15",
+            "serial_number": f"SN-{i:08d}", "description": "Stanowisko biurowe, pokój 12",
+            "purchase_day": 20240315, "category_id": 2, "uid": uuid.uuid4().hex, "version": 1790000000000 + i,
+        }
+        for i in range(1, 201)
+    ]
+    return {
+        "jedna zmiana": {"event": "reload", "changes": [{"op": "update", "id": 4711}], "seq": 120345, "traces": [trace]},
+        "paczka 500 zmian": {
+            "event": "reload",
+            "changes": [{"op": "add", "id": 10000 + i} for i in range(500)],
+            "seq": 120845,
+            "traces": [trace],
+        },
+        "200 wierszy": {"event": "reload", "changes": [{"op": "update", "id": r["id"], "item": r} for r in rows],
+                        "seq": 121045},
+    }
+
+
+def _deflated_size(data: str | bytes) -> int:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    # permessage-deflate: surowy deflate bez nagłówka zlib, bez końcowego bloku synchronizacji
+    compressor = zlib.compressobj(wbits=-15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+def _per_call_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run(repeat: int = 200) -> list[dict]:
+    results = []
+    protocols = [wire.LEGACY] + [p for p in wire.available_protocols() if p != wire.PROTOCOL_JSON]
+    for label, message in _sample_messages().items():
+        for protocol in protocols:
+            data = wire.encode(message, protocol)
+            assert wire.decode(data, protocol) == message
+            size = len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+            results.append({
+                "message": label,
+                "protocol": protocol or "json (tekst)",
+                "bytes": size,
+                "deflate_bytes": _deflated_size(data),
+                "encode_us": _per_call_us(lambda: wire.encode(message, protocol), repeat),
+                "decode_us": _per_call_us(lambda: wire.decode(data, protocol), repeat),
+            })
+    return results
+
+
+def main():
+    if wire.msgpack is None:
+        print("msgpack nie jest zainstalowany – porównanie bez niego (pip install msgpack)")
+    print(f"{'wiadomość':<18} {'protokół':<22} {'bajty':>8} {'deflate':>8} {'kod. µs':>9} {'dek. µs':>9}")
+    for r in run():
+        print(f"{r['message']:<18} {r['protocol']:<22} {r['bytes']:>8} {r['deflate_bytes']:>8} "
+              f"{r['encode_us']:>9.1f} {r['decode_us']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
+import threading
 from pathlib import Path
 from typing import Optional
 
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QFrame, QLabel, QLineEdit, QPushButton, QMessageBox, QComboBox, QStackedWidget, QGridLayout, QCalendarWidget, QRadioButton, QCheckBox, QDialog, QDialogButtonBox, QFileDialog
-from PyQt5.QtCore import Qt, QDate, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QFrame, QLabel, QLineEdit, QPushButton, QMessageBox, QComboBox, QStackedWidget, QGridLayout, QCalendarWidget, QRadioButton, QCheckBox, QDialog, QDialogButtonBox, QFileDialog, QProgressDialog, QInputDialog, QListWidget, QListWidgetItem
+from PyQt5.QtCore import Qt, QDate, QThread, pyqtSignal
 from PyQt5.QtGui import QTextCharFormat, QBrush, QColor
 
-from logic.db import Database
-from logic.export import export_inventory_to_csv, detect_usb_mount
+from logic.db import Database, DESCRIPTION_PREVIEW_LEN
+from logic.export import export_rows_to_csv, detect_usb_mount, ExportCancelled
+from logic.importer import import_csv, ImportCancelled
+from logic.backup import backup_database, BackupCancelled
+from logic.config import DATA_DIR
 
 class ItemCard(QFrame):
     """Ramka reprezentująca pojedynczy element (jak karta we Flutterze)."""
@@ -45,9 +49,10 @@ class ItemCard(QFrame):
         date_label = QLabel(item.get("purchase_date", "") or "")
         sn_label = QLabel(item.get("serial_number", "") or "")
 
+        # lista dostaje już skrócony opis (projekcja w SQL) z flagą description_truncated
         desc = item.get("description", "") or ""
-        if len(desc) > 60:
-            desc = desc[:60] + "..."
+        if item.get("description_truncated") or len(desc) > DESCRIPTION_PREVIEW_LEN:
+            desc = desc[:DESCRIPTION_PREVIEW_LEN] + "..."
         desc_label = QLabel(desc)
         desc_label.setObjectName("descLabel")
 
@@ -170,23 +175,211 @@ class DateLineEdit(QLineEdit):
         return self._date
 
 
+class ExportWorker(QThread):
+    """Eksport CSV w wątku tła – ekran dotykowy nie zamarza przy wolnym pendrivie."""
+
+    progress = pyqtSignal(int, int)
+    finished_ok = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, rows, total: int, output_path: Path, parent=None):
+        super().__init__(parent)
+        self.rows = rows
+        self.total = total
+        self.output_path = output_path
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            count = export_rows_to_csv(
+                self.rows,
+                self.output_path,
+                total=self.total,
+                progress=self.progress.emit,
+                cancel_event=self._cancel_event,
+            )
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished_ok.emit(count)
+
+
+class ImportWorker(QThread):
+    """Import CSV (np. z pendrive'a) w wątku tła."""
+
+    progress = pyqtSignal(int)
+    finished_ok = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, db: Database, input_path: Path, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.input_path = input_path
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            with open(self.input_path, newline="", encoding="utf-8-sig") as f:
+                report = import_csv(
+                    self.db,
+                    f,
+                    progress=self.progress.emit,
+                    cancel_event=self._cancel_event,
+                )
+        except ImportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished_ok.emit(report)
+
+
+class BackupWorker(QThread):
+    """Kopia bazy w wątku tła – zapisy (GUI, serwer) nie są wstrzymywane."""
+
+    progress = pyqtSignal(int, int)
+    finished_ok = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, db: Database, target_dir: Path, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.target_dir = target_dir
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            result = backup_database(
+                self.db,
+                self.target_dir,
+                progress=self.progress.emit,
+                cancel_event=self._cancel_event,
+            )
+        except BackupCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished_ok.emit(result)
+
+
+class CategoryDialog(QDialog):
+    """Edycja słownika kategorii: dodawanie, zmiana nazwy, usuwanie nieużywanych."""
+
+    def __init__(self, db: Database, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Kategorie")
+
+        layout = QVBoxLayout(self)
+        self.list_widget = QListWidget()
+        layout.addWidget(self.list_widget)
+
+        buttons = QHBoxLayout()
+        btn_add = QPushButton("Dodaj")
+        btn_rename = QPushButton("Zmień nazwę")
+        btn_delete = QPushButton("Usuń")
+        btn_add.clicked.connect(self.on_add)
+        btn_rename.clicked.connect(self.on_rename)
+        btn_delete.clicked.connect(self.on_delete)
+        for b in (btn_add, btn_rename, btn_delete):
+            buttons.addWidget(b)
+        layout.addLayout(buttons)
+
+        close_box = QDialogButtonBox(QDialogButtonBox.Close)
+        close_box.rejected.connect(self.accept)
+        layout.addWidget(close_box)
+
+        self.reload()
+
+    def reload(self):
+        self.list_widget.clear()
+        for cat in self.db.list_categories():
+            entry = QListWidgetItem(f"{cat['name']} ({cat['item_count']})")
+            entry.setData(Qt.UserRole, cat["id"])
+            entry.setData(Qt.UserRole + 1, cat["name"])
+            self.list_widget.addItem(entry)
+
+    def _selected(self):
+        entry = self.list_widget.currentItem()
+        if entry is None:
+            QMessageBox.information(self, "Kategorie", "Najpierw wybierz kategorię.")
+            return None
+        return entry.data(Qt.UserRole), entry.data(Qt.UserRole + 1)
+
+    def _run(self, action):
+        try:
+            action()
+        except ValueError as e:
+            QMessageBox.warning(self, "Kategorie", str(e))
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd bazy", str(e))
+        self.reload()
+
+    def on_add(self):
+        name, ok = QInputDialog.getText(self, "Nowa kategoria", "Nazwa:")
+        if ok:
+            self._run(lambda: self.db.add_category(name))
+
+    def on_rename(self):
+        selected = self._selected()
+        if selected is None:
+            return
+        category_id, old_name = selected
+        name, ok = QInputDialog.getText(self, "Zmień nazwę", "Nazwa:", text=old_name)
+        if ok and name.strip() != old_name:
+            self._run(lambda: self.db.rename_category(category_id, name))
+
+    def on_delete(self):
+        selected = self._selected()
+        if selected is None:
+            return
+        category_id, name = selected
+        reply = QMessageBox.question(self, "Usuń kategorię", f"Usunąć kategorię {name!r}?")
+        if reply == QMessageBox.Yes:
+            self._run(lambda: self.db.delete_category(category_id))
+
+
 class MainView(QWidget):
     """Główny widok aplikacji: lista, formularz i strona sortowania/filtrowania."""
             
     reload_signal = pyqtSignal()
+    # po każdym przeładowaniu listy (potwierdzenie śladów zmian dla serwera)
+    items_loaded = pyqtSignal()
 
-    def __init__(self, parent: Optional[QWidget] = None):
+    def __init__(self, parent: Optional[QWidget] = None, db: Optional[Database] = None):
         super().__init__(parent)
 
         # --- baza danych ---
-        base_dir = Path(__file__).resolve().parent.parent
-        data_dir = base_dir / "data"
-        data_dir.mkdir(exist_ok=True)
-        db_path = data_dir / "inventory.db"
-        self.db = Database(db_path)
+        # w trybie wbudowanym GUI dzieli instancję Database z serwerem
+        if db is None:
+            base_dir = Path(__file__).resolve().parent.parent
+            data_dir = Path(DATA_DIR) if DATA_DIR else base_dir / "data"
+            data_dir.mkdir(parents=True, exist_ok=True)
+            db_path = data_dir / "inventory.db"
+            db = Database(db_path)
+        self.db = db
 
         self.items: list[dict] = []
         self.search_query = ""
+        # id pasujące do wyszukiwania (liczone w bazie – lista ma tylko skrócone opisy)
+        self._search_ids: Optional[set[int]] = None
+        # brak dokładnych wyników -> podobne wpisy (literówki); id -> pozycja w rankingu podobieństwa
+        self._fuzzy_rank: Optional[dict[int, int]] = None
         self.selected_item: Optional[dict] = None
         self.selected_card: Optional[ItemCard] = None
 
@@ -194,17 +387,14 @@ class MainView(QWidget):
 
         # sortowanie / filtrowanie
         self.sort_mode: str = "id"  # 'id', 'date_asc', 'date_desc'
-        self.filter_categories: list[str] = []
-        self.all_categories: list[str] = [
-            "Narzędzia",
-            "IT",
-            "Oprogramowanie",
-            "Wyposażenie biurowe",
-            "Transport",
-            "BHP",
-            "Meble",
-            "Inne",
-        ]
+        # id kategorii (filtr przetrwa zmianę nazwy)
+        self.filter_categories: list[int] = []
+        # zakres dat zakupu (None = bez filtra); zapytanie idzie po indeksie purchase_day
+        self.filter_date_from: Optional[QDate] = None
+        self.filter_date_to: Optional[QDate] = None
+        # słownik kategorii z bazy: [{"id", "name", "item_count"}]
+        self.categories: list[dict] = self.db.list_categories()
+        self.all_categories: list[str] = [c["name"] for c in self.categories]
         self.action_mode: str = "normal"
         self.delete_mode: bool = False
         self.selected_ids: set[int] = set()
@@ -214,6 +404,10 @@ class MainView(QWidget):
         self.rb_sort_date_asc: Optional[QRadioButton] = None
         self.rb_sort_date_desc: Optional[QRadioButton] = None
         self.cat_checkboxes: list[QCheckBox] = []
+        self.cat_grid: Optional[QGridLayout] = None
+        self.cb_date_filter: Optional[QCheckBox] = None
+        self.date_from_edit: Optional[DateLineEdit] = None
+        self.date_to_edit: Optional[DateLineEdit] = None
 
         # ---------- STACKED WIDGET: LISTA / FORMULARZ / SORT/FILTR ----------
         self.stack = QStackedWidget(self)
@@ -243,6 +437,9 @@ class MainView(QWidget):
         self.stack.addWidget(self.preview_page)
 
         self.preview_item: Optional[dict] = None
+        self._export_worker: Optional[ExportWorker] = None
+        self._import_worker: Optional[ImportWorker] = None
+        self._backup_worker: Optional[BackupWorker] = None
 
         # Styl ciemny
         self.setStyleSheet("""
@@ -323,6 +520,14 @@ class MainView(QWidget):
         self.btn_export.setFixedHeight(24)
         self.btn_export.clicked.connect(self.on_export_clicked)
 
+        self.btn_import = QPushButton("Import CSV")
+        self.btn_import.setFixedHeight(24)
+        self.btn_import.clicked.connect(self.on_import_clicked)
+
+        self.btn_backup = QPushButton("Kopia bazy")
+        self.btn_backup.setFixedHeight(24)
+        self.btn_backup.clicked.connect(self.on_backup_clicked)
+
         self.search_edit = QLineEdit()
         self.search_edit.setPlaceholderText("Szukaj po nazwie / SN / opisie...")
         self.search_edit.setFixedHeight(24)
@@ -330,6 +535,8 @@ class MainView(QWidget):
 
         top_layout.addWidget(self.btn_sort_filter)
         top_layout.addWidget(self.btn_export)
+        top_layout.addWidget(self.btn_import)
+        top_layout.addWidget(self.btn_backup)
         top_layout.addStretch(1)
         top_layout.addWidget(self.search_edit)
 
@@ -550,13 +757,36 @@ class MainView(QWidget):
         layout.addWidget(self.rb_sort_date_desc)
 
         layout.addSpacing(8)
-        layout.addWidget(QLabel("Filtruj po kategoriach:"))
+        cat_header = QHBoxLayout()
+        cat_header.setContentsMargins(0, 0, 0, 0)
+        cat_header.addWidget(QLabel("Filtruj po kategoriach:"), 1)
+        self.btn_categories = QPushButton("Kategorie...")
+        self.btn_categories.clicked.connect(self.on_categories_clicked)
+        cat_header.addWidget(self.btn_categories)
+        layout.addLayout(cat_header)
+
+        # kategorie w dwóch kolumnach – mieści się też filtr dat
+        self.cat_grid = QGridLayout()
+        self.cat_grid.setContentsMargins(0, 0, 0, 0)
+        self.cat_grid.setHorizontalSpacing(12)
+        self.cat_grid.setVerticalSpacing(2)
+        self._rebuild_category_checkboxes()
+        layout.addLayout(self.cat_grid)
 
-        self.cat_checkboxes = []
-        for cat in self.all_categories:
-            cb = QCheckBox(cat)
-            self.cat_checkboxes.append(cb)
-            layout.addWidget(cb)
+        layout.addSpacing(8)
+        date_row = QHBoxLayout()
+        date_row.setContentsMargins(0, 0, 0, 0)
+        date_row.setSpacing(6)
+        self.cb_date_filter = QCheckBox("Data zakupu od:")
+        self.date_from_edit = DateLineEdit()
+        self.date_to_edit = DateLineEdit()
+        for w in (self.date_from_edit, self.date_to_edit):
+            w.setMaximumHeight(24)
+        date_row.addWidget(self.cb_date_filter)
+        date_row.addWidget(self.date_from_edit, 1)
+        date_row.addWidget(QLabel("do:"))
+        date_row.addWidget(self.date_to_edit, 1)
+        layout.addLayout(date_row)
 
         layout.addStretch(1)
 
@@ -644,11 +874,76 @@ class MainView(QWidget):
 
     def load_items(self):
         try:
-            self.items = self.db.list_items()
+            date_from = date_to = None
+            if self.filter_date_from is not None and self.filter_date_to is not None:
+                date_from = self.filter_date_from.toString("yyyy-MM-dd")
+                date_to = self.filter_date_to.toString("yyyy-MM-dd")
+            self.items = self.db.list_items(preview=True, date_from=date_from, date_to=date_to)
+            self._update_search_ids()
         except Exception as e:
             QMessageBox.critical(self, "Błąd bazy", str(e))
             self.items = []
+        self._reload_categories()
         self.refresh_list()
+        self.items_loaded.emit()
+
+    def _rebuild_category_checkboxes(self):
+        for cb in self.cat_checkboxes:
+            self.cat_grid.removeWidget(cb)
+            cb.setParent(None)
+        self.cat_checkboxes = []
+        for i, cat in enumerate(self.categories):
+            cb = QCheckBox(f"{cat['name']} ({cat['item_count']})")
+            # tekst pokazuje też licznik, id kategorii trzymamy osobno
+            cb.setProperty("category_id", cat["id"])
+            cb.setChecked(cat["id"] in self.filter_categories)
+            self.cat_checkboxes.append(cb)
+            self.cat_grid.addWidget(cb, i // 2, i % 2)
+
+    def _reload_categories(self):
+        """Słownik kategorii z bazy: liczniki (stats_category, bez skanu), a po zmianie słownika – nowe pola."""
+        try:
+            categories = self.db.list_categories()
+        except Exception:
+            return
+        old_ids = [c["id"] for c in self.categories]
+        self.categories = categories
+        self.all_categories = [c["name"] for c in categories]
+
+        current = self.category_cb.currentText()
+        self.category_cb.blockSignals(True)
+        self.category_cb.clear()
+        self.category_cb.addItems(self.all_categories)
+        idx = self.category_cb.findText(current)
+        if idx >= 0:
+            self.category_cb.setCurrentIndex(idx)
+        self.category_cb.blockSignals(False)
+
+        ids = [c["id"] for c in categories]
+        self.filter_categories = [i for i in self.filter_categories if i in ids]
+        if ids != old_ids:
+            self._rebuild_category_checkboxes()
+            return
+        for cb, cat in zip(self.cat_checkboxes, categories):
+            cb.setText(f"{cat['name']} ({cat['item_count']})")
+
+    def _update_search_ids(self):
+        q = (self.search_query or "").strip()
+        self._search_ids = self.db.search_item_ids(q) if q else None
+        self._fuzzy_rank = None
+        if q and not self._search_ids:
+            similar = self.db.fuzzy_find(q, limit=20)
+            if similar:
+                self._fuzzy_rank = {it["id"]: rank for rank, it in enumerate(similar)}
+                self._search_ids = set(self._fuzzy_rank)
+
+    def _full_item(self, item: dict) -> dict:
+        """Pełny wiersz (z całym opisem) dla podglądu i formularza edycji."""
+        try:
+            return self.db.get_item(item["id"]) or item
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd bazy", str(e))
+            return item
 
     def refresh_list(self):
         while self.list_layout.count():
@@ -660,36 +955,13 @@ class MainView(QWidget):
         self.selected_item = None
         self.selected_card = None
 
-        items = list(self.items)
-
-        # wyszukiwanie
-        q = (self.search_query or "").strip().lower()
-        if q:
-            items = [
-                it for it in items
-                if q in (it.get("name", "") or "").lower()
-                or q in (it.get("serial_number", "") or "").lower()
-                or q in (it.get("description", "") or "").lower()
-            ]
-
-        # filtrowanie po kategoriach
-        if self.filter_categories:
-            items = [
-                it for it in items
-                if (it.get("category") or "") in self.filter_categories
-            ]
-
-        # sortowanie
-        if self.sort_mode == "date_asc":
-            items.sort(key=lambda it: it.get("purchase_date", "") or "")
-        elif self.sort_mode == "date_desc":
-            items.sort(key=lambda it: it.get("purchase_date", "") or "", reverse=True)
-        else:  # 'id'
-            items.sort(key=lambda it: it.get("id", 0))
+        items = self._current_view_items()
 
         if not items:
             self.list_layout.addWidget(QLabel("Brak danych do wyświetlenia."))
         else:
+            if self._fuzzy_rank is not None:
+                self.list_layout.addWidget(QLabel("Brak dokładnych wyników – podobne wpisy:"))
             for it in items:
                 checked = it["id"] in getattr(self, "selected_ids", set())
                 card = ItemCard(
@@ -708,27 +980,24 @@ class MainView(QWidget):
         items = list(self.items)
 
         # wyszukiwanie
-        q = (self.search_query or "").strip().lower()
-        if q:
-            items = [
-                it for it in items
-                if q in (it.get("name", "") or "").lower()
-                or q in (it.get("serial_number", "") or "").lower()
-                or q in (it.get("description", "") or "").lower()
-            ]
+        if self._search_ids is not None:
+            items = [it for it in items if it["id"] in self._search_ids]
 
-        # filtrowanie po kategoriach
+        # filtrowanie po kategoriach (po id)
         if self.filter_categories:
             items = [
                 it for it in items
-                if (it.get("category") or "") in self.filter_categories
+                if it.get("category_id") in self.filter_categories
             ]
 
-        # sortowanie
-        if self.sort_mode == "date_asc":
-            items.sort(key=lambda it: it.get("purchase_date", "") or "")
+        # sortowanie (purchase_day = RRRRMMDD, wpisy bez poprawnej daty na końcu/początku)
+        if self._fuzzy_rank is not None:
+            # wyniki przybliżone – najbardziej podobne na górze
+            items.sort(key=lambda it: self._fuzzy_rank.get(it["id"], len(self._fuzzy_rank)))
+        elif self.sort_mode == "date_asc":
+            items.sort(key=lambda it: it.get("purchase_day") or 0)
         elif self.sort_mode == "date_desc":
-            items.sort(key=lambda it: it.get("purchase_date", "") or "", reverse=True)
+            items.sort(key=lambda it: it.get("purchase_day") or 0, reverse=True)
         else:  # 'id'
             items.sort(key=lambda it: it.get("id", 0))
 
@@ -747,12 +1016,24 @@ class MainView(QWidget):
 
         # Ustaw checkboxy kategorii
         for cb in self.cat_checkboxes:
-            cb.setChecked(cb.text() in self.filter_categories)
+            cb.setChecked(cb.property("category_id") in self.filter_categories)
+
+        # Zakres dat
+        date_filter = self.filter_date_from is not None
+        self.cb_date_filter.setChecked(date_filter)
+        self.date_from_edit.setDate(self.filter_date_from if date_filter else QDate.currentDate().addYears(-1))
+        self.date_to_edit.setDate(self.filter_date_to if date_filter else QDate.currentDate())
 
         self.stack.setCurrentWidget(self.sort_page)
 
     def on_search_changed(self, text: str):
         self.search_query = text
+        try:
+            self._update_search_ids()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd bazy", str(e))
+            self._search_ids = None
+            self._fuzzy_rank = None
         self.refresh_list()
 
     def on_item_clicked(self, item: dict, card: ItemCard):
@@ -781,6 +1062,7 @@ class MainView(QWidget):
 
         # TRYB EDYCJI (po naciśnięciu przycisku „Edytuj”)
         if self.action_mode == "edit":
+            item = self._full_item(item)
             self._form_mode = "edit"
             self.form_title.setText("Edytuj przedmiot")
             self.selected_item = item
@@ -824,7 +1106,8 @@ class MainView(QWidget):
         if getattr(self, "delete_mode", False):
             return
 
-        # zapamiętaj element
+        # zapamiętaj element (lista ma tylko skrócony opis – pobierz pełny wiersz)
+        item = self._full_item(item)
         self.preview_item = item
 
         # ustaw pola na stronie podglądu
@@ -951,6 +1234,14 @@ class MainView(QWidget):
 
     # ---------- obsługa UI: strona sortowania ----------
 
+    def on_categories_clicked(self):
+        # niezatwierdzone zaznaczenia na stronie filtrów zachowujemy po przebudowie pól
+        checked = {cb.property("category_id") for cb in self.cat_checkboxes if cb.isChecked()}
+        CategoryDialog(self.db, parent=self).exec_()
+        self.load_items()
+        for cb in self.cat_checkboxes:
+            cb.setChecked(cb.property("category_id") in checked)
+
     def on_sort_cancel(self):
         self.stack.setCurrentWidget(self.list_page)
 
@@ -964,9 +1255,18 @@ class MainView(QWidget):
             self.sort_mode = "id"
 
         # zaktualizuj listę wybranych kategorii
-        self.filter_categories = [cb.text() for cb in self.cat_checkboxes if cb.isChecked()]
+        self.filter_categories = [cb.property("category_id") for cb in self.cat_checkboxes if cb.isChecked()]
+
+        # zakres dat – zmienia zapytanie do bazy, więc przeładuj listę
+        if self.cb_date_filter.isChecked():
+            d_from, d_to = self.date_from_edit.date(), self.date_to_edit.date()
+            if d_from > d_to:
+                d_from, d_to = d_to, d_from
+            self.filter_date_from, self.filter_date_to = d_from, d_to
+        else:
+            self.filter_date_from = self.filter_date_to = None
 
-        self.refresh_list()
+        self.load_items()
         self.stack.setCurrentWidget(self.list_page)
 
     # ---------- obsługa UI: strona podglądu ----------
@@ -1041,20 +1341,167 @@ class MainView(QWidget):
         if not path_str:
             return
 
-        try:
-            # UWAGA: tu możesz wybrać, czy eksportujesz CAŁĄ bazę,
-            # czy tylko przefiltrowaną listę:
-            # 1) cała baza:
-            # rows = self.db.list_items()
-            #
-            # 2) tylko to, co jest po filtrach/szukaniu/sortowaniu:
-            rows = self._current_view_items()
-
-            export_inventory_to_csv(rows, Path(path_str))
+        # UWAGA: tu możesz wybrać, czy eksportujesz CAŁĄ bazę,
+        # czy tylko przefiltrowaną listę:
+        # 1) cała baza:
+        # rows, total = self.db.iter_items(), self.db.count_items()
+        #
+        # 2) tylko to, co jest po filtrach/szukaniu/sortowaniu:
+        # lista trzyma skrócone opisy – pełne wiersze dociągamy porcjami w wątku eksportu
+        ids = [it["id"] for it in self._current_view_items()]
+        rows = self.db.iter_items_by_ids(ids)
+        total = len(ids)
+
+        progress_dlg = QProgressDialog("Eksport do pliku CSV...", "Anuluj", 0, max(total, 1), self)
+        progress_dlg.setWindowTitle("Eksport CSV")
+        progress_dlg.setWindowModality(Qt.WindowModal)
+        progress_dlg.setMinimumDuration(0)
+        progress_dlg.setAutoClose(False)
+        progress_dlg.setAutoReset(False)
+
+        worker = ExportWorker(rows, total, Path(path_str), parent=self)
+        self._export_worker = worker
+        self.btn_export.setEnabled(False)
+
+        def finish():
+            progress_dlg.close()
+            self.btn_export.setEnabled(True)
+            self._export_worker = None
+
+        def on_done(count: int):
+            finish()
             QMessageBox.information(
                 self,
                 "Eksport zakończony",
                 f"Zapisano dane do pliku:\n{path_str}",
             )
-        except Exception as e:
-            QMessageBox.critical(self, "Błąd eksportu", str(e))
\ No newline at end of file
+
+        def on_failed(msg: str):
+            finish()
+            QMessageBox.critical(self, "Błąd eksportu", msg)
+
+        def on_cancelled():
+            finish()
+            self.status_label.setText("Eksport przerwany – plik nie został zmieniony.")
+
+        worker.progress.connect(lambda done, all_: progress_dlg.setValue(done))
+        worker.finished_ok.connect(on_done)
+        worker.failed.connect(on_failed)
+        worker.cancelled.connect(on_cancelled)
+        progress_dlg.canceled.connect(worker.cancel)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+
+    # ---------- import z CSV ----------
+    def on_import_clicked(self):
+        """Import CSV (np. z arkusza) – domyślnie z pendrive'a."""
+        start_dir = detect_usb_mount() or Path.home()
+
+        path_str, _ = QFileDialog.getOpenFileName(
+            self,
+            "Importuj plik CSV",
+            str(start_dir),
+            "Pliki CSV (*.csv);;Wszystkie pliki (*.*)",
+        )
+        if not path_str:
+            return
+
+        # liczba wierszy nie jest znana z góry – pasek w trybie "zajęty"
+        progress_dlg = QProgressDialog("Import z pliku CSV...", "Anuluj", 0, 0, self)
+        progress_dlg.setWindowTitle("Import CSV")
+        progress_dlg.setWindowModality(Qt.WindowModal)
+        progress_dlg.setMinimumDuration(0)
+        progress_dlg.setAutoClose(False)
+        progress_dlg.setAutoReset(False)
+
+        worker = ImportWorker(self.db, Path(path_str), parent=self)
+        self._import_worker = worker
+        self.btn_import.setEnabled(False)
+
+        def finish():
+            progress_dlg.close()
+            self.btn_import.setEnabled(True)
+            self._import_worker = None
+            self.load_items()
+
+        def on_done(report: dict):
+            finish()
+            msg = (
+                f"Przetworzono wierszy: {report['rows']}\n"
+                f"Dodano: {report['inserted']}, zaktualizowano: {report['updated']}\n"
+                f"Błędne wiersze: {report['error_count']}"
+            )
+            errors = report["errors"][:10]
+            if errors:
+                msg += "\n\n" + "\n".join(f"wiersz {e['line']}: {e['error']}" for e in errors)
+            QMessageBox.information(self, "Import zakończony", msg)
+
+        def on_failed(msg: str):
+            finish()
+            QMessageBox.critical(self, "Błąd importu", msg)
+
+        def on_cancelled():
+            finish()
+            self.status_label.setText("Import przerwany – zapisano wiersze przetworzone do tej chwili.")
+
+        worker.progress.connect(lambda done: progress_dlg.setLabelText(f"Import z pliku CSV... ({done} wierszy)"))
+        worker.finished_ok.connect(on_done)
+        worker.failed.connect(on_failed)
+        worker.cancelled.connect(on_cancelled)
+        progress_dlg.canceled.connect(worker.cancel)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+
+    # ---------- kopia zapasowa bazy ----------
+    def on_backup_clicked(self):
+        """Kopia całej bazy (z id, do odtworzenia) na pendrive; starsze kopie są rotowane."""
+        target_dir = detect_usb_mount()
+        if target_dir is None:
+            dir_str = QFileDialog.getExistingDirectory(self, "Katalog kopii zapasowej", str(Path.home()))
+            if not dir_str:
+                return
+            target_dir = Path(dir_str)
+
+        progress_dlg = QProgressDialog("Kopia zapasowa bazy...", "Anuluj", 0, 100, self)
+        progress_dlg.setWindowTitle("Kopia bazy")
+        progress_dlg.setWindowModality(Qt.WindowModal)
+        progress_dlg.setMinimumDuration(0)
+        progress_dlg.setAutoClose(False)
+        progress_dlg.setAutoReset(False)
+
+        worker = BackupWorker(self.db, target_dir, parent=self)
+        self._backup_worker = worker
+        self.btn_backup.setEnabled(False)
+
+        def finish():
+            progress_dlg.close()
+            self.btn_backup.setEnabled(True)
+            self._backup_worker = None
+
+        def on_done(result: dict):
+            finish()
+            QMessageBox.information(
+                self,
+                "Kopia zakończona",
+                f"Zapisano i sprawdzono kopię bazy:\n{result['path']}",
+            )
+
+        def on_failed(msg: str):
+            finish()
+            QMessageBox.critical(self, "Błąd kopii zapasowej", msg)
+
+        def on_cancelled():
+            finish()
+            self.status_label.setText("Kopia przerwana – poprzednie kopie pozostały bez zmian.")
+
+        def on_progress(copied: int, total: int):
+            progress_dlg.setMaximum(max(total, 1))
+            progress_dlg.setValue(copied)
+
+        worker.progress.connect(on_progress)
+        worker.finished_ok.connect(on_done)
+        worker.failed.connect(on_failed)
+        worker.cancelled.connect(on_cancelled)
+        progress_dlg.canceled.connect(worker.cancel)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
@@ -1,34 +1,88 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from pathlib import Path
-from logic.db import Database
-from logic.export import export_inventory_to_csv
+from logic.admission import AdmissionController, Rejected
+from logic.db import preview_item
+from logic.export import export_rows_to_csv, detect_usb_mount
+from logic.backup import backup_database
+from logic.importer import import_csv
+from logic.inventories import DEFAULT_INVENTORY, Inventory, InventoryRegistry
+from logic.subscriptions import MAX_RANGES, Subscription
+from logic import tracing, wire
+from logic.config import CHANGES_WAIT_MAX_TIMEOUT, DATA_DIR, SERVER_PORT, SERVER_WORKERS, WS_COMPRESSION
 import asyncio
-import json
+import io
+import tempfile
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await registry.start()
+    idle_closer = asyncio.create_task(registry.run_idle_closer())
+    yield
+    idle_closer.cancel()
+    await registry.close_all()
 
 # --- konfiguracja aplikacji ---
-app = FastAPI(title="Inventory WiFi Server")
+app = FastAPI(title="Inventory WiFi Server", lifespan=lifespan)
 
-# --- zarządzanie połączeniami WebSocket ---
-clients: list[WebSocket] = []
+# każda zmiana przez REST dostaje identyfikator śladu (nagłówek X-Trace-Id klienta albo nowy)
+@app.middleware("http")
+async def trace_writes(request: Request, call_next):
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        return await call_next(request)
+    trace = tracing.begin(request.headers.get("x-trace-id"))
+    response = await call_next(request)
+    response.headers["X-Trace-Id"] = trace["id"]
+    return response
 
-async def broadcast(message: str):
-    """Wysyła tekst JSON do wszystkich aktywnych klientów."""
-    stale_clients = []
-    for ws in clients.copy():
-        try:
-            await ws.send_text(message)
-        except Exception:
-            stale_clients.append(ws)
-    for ws in stale_clients:
-        if ws in clients:
-            clients.remove(ws)
-
-# --- inicjalizacja bazy ---
-data_dir = Path(__file__).resolve().parent / "data"
-data_dir.mkdir(exist_ok=True)
-db_path = data_dir / "inventory.db"
-db = Database(db_path)
+# limity odczytów / zapisów / eksportu; dodane po trace_writes, więc działa przed nim (odrzucone nie dostają śladu)
+admission = AdmissionController()
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    lane = admission.classify(request.method, request.url.path, request.client.host if request.client else None)
+    try:
+        return await admission.run(lane, lambda: call_next(request))
+    except Rejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Serwer przeciążony, spróbuj ponownie później", "lane": e.lane, "reason": e.reason},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+# --- magazyny (każdy we własnym pliku SQLite) ---
+data_dir = Path(DATA_DIR) if DATA_DIR else Path(__file__).resolve().parent / "data"
+data_dir.mkdir(parents=True, exist_ok=True)
+registry = InventoryRegistry(data_dir)
+
+# domyślny magazyn: ścieżki bez prefiksu i GUI (także w trybie wbudowanym)
+default_inventory = registry.default
+db = default_inventory.db
+publish_change = default_inventory.publish_change
+
+def add_local_listener(callback):
+    """Słuchacz w tym samym procesie (np. GUI w trybie wbudowanym), wołany w wątku pętli serwera."""
+    default_inventory.broadcaster.listeners.append(callback)
+
+async def get_inventory(inventory: str = DEFAULT_INVENTORY):
+    """Magazyn z adresu /inventories/{inventory}/...; bez prefiksu – domyślny."""
+    try:
+        inv = await registry.get(inventory)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Nie znaleziono magazynu")
+    inv.active += 1
+    try:
+        yield inv
+    finally:
+        inv.active -= 1
+        inv.touch()
+
+# te same ścieżki dla każdego magazynu: /items oraz /inventories/{nazwa}/items
+router = APIRouter()
 
 # --- model danych ---
 class Item(BaseModel):
@@ -39,27 +93,72 @@ class Item(BaseModel):
     serial_number: str
     description: str
 
+class Category(BaseModel):
+    name: str
+
 # --- główne endpointy REST API ---
-@app.get("/items")
-def list_items():
-    return db.list_items()
+@router.get("/items")
+def list_items(category: str | None = None, ids: str | None = None, view: str = "full",
+               date_from: str | None = None, date_to: str | None = None, inv: Inventory = Depends(get_inventory)):
+    """
+    Lista (opcjonalnie tylko kategoria) albo paczka konkretnych wpisów: ?ids=1,2,3.
+    ?view=preview zwraca projekcję listową (opis skrócony, flaga description_truncated).
+    ?date_from=RRRR-MM-DD&date_to=RRRR-MM-DD – zakres dat zakupu (zapytanie po indeksie w bazie).
+    """
+    if view not in ("full", "preview"):
+        raise HTTPException(status_code=400, detail="view musi mieć wartość 'full' lub 'preview'")
+    if ids is not None:
+        try:
+            wanted = [int(x) for x in ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids musi być listą liczb oddzielonych przecinkami")
+        items = inv.cache.get_many(wanted)
+    elif date_from or date_to:
+        try:
+            items = inv.db.list_items(category=category, date_from=date_from, date_to=date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        items = inv.cache.list_items(category)
+    if view == "preview":
+        return [preview_item(it) for it in items]
+    return items
+
+@router.get("/items/fuzzy")
+def fuzzy_find_items(q: str, limit: int = 10, inv: Inventory = Depends(get_inventory)):
+    """Wpisy o nazwie lub numerze seryjnym podobnym do q (literówki), od najbardziej podobnych, z polem score."""
+    return inv.db.fuzzy_find(q, max(1, min(limit, 100)))
+
+@router.get("/items/by-serial/{serial_number}")
+def get_item_by_serial(serial_number: str, inv: Inventory = Depends(get_inventory)):
+    item = inv.cache.get_by_serial(serial_number)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Nie znaleziono przedmiotu")
+    return item
+
+@router.get("/items/{item_id}")
+def get_item(item_id: int, inv: Inventory = Depends(get_inventory)):
+    item = inv.cache.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Nie znaleziono przedmiotu")
+    return item
 
-@app.post("/items")
-async def add_item(item: Item):
-    db.add_item(
+@router.post("/items")
+async def add_item(item: Item, inv: Inventory = Depends(get_inventory)):
+    await inv.executor.run(
+        inv.db.add_item,
         item.name,
         item.category,
         item.purchase_date,
         item.serial_number,
         item.description,
     )
-    # powiadom klientów o zmianie
-    await broadcast(json.dumps({"event": "reload"}))
     return {"status": "ok"}
 
-@app.put("/items/{item_id}")
-async def update_item(item_id: int, item: Item):
-    db.update_item(
+@router.put("/items/{item_id}")
+async def update_item(item_id: int, item: Item, inv: Inventory = Depends(get_inventory)):
+    await inv.executor.run(
+        inv.db.update_item,
         item_id,
         item.name,
         item.category,
@@ -67,50 +166,349 @@ async def update_item(item_id: int, item: Item):
         item.serial_number,
         item.description,
     )
-    await broadcast(json.dumps({"event": "reload"}))
     return {"status": "ok"}
 
-@app.delete("/items/{item_id}")
-async def delete_item(item_id: int):
-    db.delete_item(item_id)
-    await broadcast(json.dumps({"event": "reload"}))
+@router.delete("/items/{item_id}")
+async def delete_item(item_id: int, inv: Inventory = Depends(get_inventory)):
+    await inv.executor.run(inv.db.delete_item, item_id)
+    return {"status": "ok"}
+
+@router.get("/stats")
+def stats(inv: Inventory = Depends(get_inventory)):
+    """Liczba wpisów łącznie, per kategoria i per rok zakupu (liczniki utrzymywane triggerami)."""
+    return inv.db.get_stats()
+
+# --- słownik kategorii ---
+@router.get("/categories")
+def list_categories(inv: Inventory = Depends(get_inventory)):
+    """Kategorie (id, nazwa) z liczbą przypisanych wpisów."""
+    return inv.db.list_categories()
+
+@router.post("/categories")
+async def add_category(category: Category, inv: Inventory = Depends(get_inventory)):
+    try:
+        new_id = await inv.executor.run(inv.db.add_category, category.name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "ok", "id": new_id}
+
+@router.put("/categories/{category_id}")
+async def rename_category(category_id: int, category: Category, inv: Inventory = Depends(get_inventory)):
+    try:
+        found = await inv.executor.run(inv.db.rename_category, category_id, category.name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail="Nie znaleziono kategorii")
+    return {"status": "ok"}
+
+@router.delete("/categories/{category_id}")
+async def delete_category(category_id: int, inv: Inventory = Depends(get_inventory)):
+    try:
+        found = await inv.executor.run(inv.db.delete_category, category_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail="Nie znaleziono kategorii")
     return {"status": "ok"}
 
 # --- specjalne endpointy ---
-@app.post("/notify_reload")
-async def notify_reload():
+@router.post("/notify_reload")
+async def notify_reload(event: dict | None = Body(default=None), inv: Inventory = Depends(get_inventory)):
     """Wywoływane przez aplikację Tkinter (local HTTP),
     żeby rozgłosić zmianę po stronie RPi."""
-    await broadcast(json.dumps({"event": "reload"}))
+    if event and "seq" in event:
+        # numer z treści (bez uwierzytelnienia) nie może wyprzedzić dziennika zmian – inaczej
+        # klienci /changes/wait i /ws dostawaliby w kółko full z numerem spoza dziennika
+        seq = event["seq"]
+        current = await asyncio.to_thread(inv.db.last_change_seq)
+        event = {k: v for k, v in event.items() if k != "seq"}
+        if isinstance(seq, int) and not isinstance(seq, bool):
+            event["seq"] = min(seq, current)
+    inv.bus.notify_external(event)
     return {"status": "ok"}
 
-@app.get("/export")
-def export_csv():
-    path = data_dir / "export.csv"
-    export_inventory_to_csv(db.list_items(), path)
-    return {"status": "ok", "path": str(path)}
+@router.get("/export")
+def export_csv(inv: Inventory = Depends(get_inventory)):
+    name = "export.csv" if inv.name == DEFAULT_INVENTORY else f"export-{inv.name}.csv"
+    path = data_dir / name
+    count = export_rows_to_csv(inv.db.iter_items(), path, total=inv.db.count_items())
+    return {"status": "ok", "path": str(path), "rows": count}
+
+@router.post("/import")
+async def import_items(request: Request, inv: Inventory = Depends(get_inventory)):
+    """Import CSV wysłanego jako surowe body (text/csv); upsert po numerze seryjnym."""
+    # body trafia do pliku tymczasowego (w RAM tylko pierwszy 1 MB), parsowanie jest strumieniowe
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        async for chunk in request.stream():
+            # po przekroczeniu 1 MB każdy zapis idzie na dysk – poza pętlą serwera
+            await asyncio.to_thread(spool.write, chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    text = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    try:
+        report = await inv.executor.run(import_csv, inv.db, text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        text.close()
+    return {"status": "ok", **report}
+
+async def _run_backup(inv: Inventory, target_dir: Path):
+    state = inv.backup_state
+
+    def progress(copied: int, total: int):
+        state["copied_pages"] = copied
+        state["total_pages"] = total
+
+    # kopie innych magazynów nie mieszają się z kopiami domyślnego przy rotacji
+    prefix = "inventory-" if inv.name == DEFAULT_INVENTORY else f"inventory-{inv.name}-"
+    try:
+        # własny wątek, nie inv.executor – długa kopia nie zajmuje wątku zapisów
+        result = await asyncio.to_thread(backup_database, inv.db, target_dir, progress=progress, prefix=prefix)
+    except Exception as e:
+        print("Błąd kopii zapasowej:", e)
+        state.update(status="error", error=str(e))
+        return
+    state.update(status="done", **result)
+
+@router.post("/backup", status_code=202)
+async def start_backup(inv: Inventory = Depends(get_inventory)):
+    """
+    Kopia bazy (API backup SQLite, bez blokowania zapisów) na pendrive,
+    a bez pendrive'a do data/backups. Postęp: GET /backup.
+    """
+    state = inv.backup_state
+    if state["status"] == "running":
+        raise HTTPException(status_code=409, detail="Kopia zapasowa już trwa")
+    target_dir = detect_usb_mount() or data_dir / "backups"
+    state.clear()
+    state.update(status="running", target=str(target_dir), copied_pages=0, total_pages=None)
+    inv.backup_task = asyncio.create_task(_run_backup(inv, target_dir))
+    return state
+
+@router.get("/backup")
+def backup_status(inv: Inventory = Depends(get_inventory)):
+    return inv.backup_state
+
+# --- long-poll dla klientów bez stałego WebSocketu ---
+@router.get("/changes/wait")
+async def wait_for_changes(since: int, timeout: float = 30, inv: Inventory = Depends(get_inventory)):
+    """
+    Trzyma żądanie, aż numer zmiany przekroczy `since` (najwyżej `timeout` s), i zwraca
+    nowy numer oraz zmienione id. `full: true` – zmian było za dużo, dziennik przycięty
+    albo numer klienta jest z innej bazy: klient pobiera całe /items. since=-1 zwraca bieżący numer.
+    """
+    timeout = max(0.0, min(timeout, CHANGES_WAIT_MAX_TIMEOUT))
+    if since < 0:
+        return {"seq": inv.last_seq, "changes": [], "full": True, "timeout": False}
+    if since > inv.last_seq:
+        # inny worker mógł właśnie zapisać; jeśli nie – numer spoza tej bazy (np. po odtworzeniu kopii)
+        current = await asyncio.to_thread(inv.db.last_change_seq)
+        if since > current:
+            return {"seq": current, "changes": [], "full": True, "timeout": False}
+    if not await inv.wait_for_change(since, timeout):
+        return {"seq": inv.last_seq, "changes": [], "full": False, "timeout": True}
+    return {**await inv.changes_after(since), "timeout": False}
+
+# --- konserwacja bazy ---
+@router.get("/maintenance")
+def maintenance_status(inv: Inventory = Depends(get_inventory)):
+    """Kiedy ostatnio (i jak długo) wykonano każde zadanie konserwacji i czy baza jest teraz bezczynna."""
+    return inv.maintenance.status()
+
+# --- weryfikacja pełnego stanu (sumy kontrolne zakresów id) ---
+@router.get("/sync/digest")
+def sync_digest(lo: int = 0, hi: int | None = None, parts: int = 16, inv: Inventory = Depends(get_inventory)):
+    """
+    Skrót zakresu id [lo, hi) i jego podzakresów: klient porównuje je ze swoją
+    kopią, schodzi tylko do różniących się zakresów i pobiera ich wiersze (/sync/rows).
+    """
+    if hi is not None and hi <= lo:
+        raise HTTPException(status_code=400, detail="hi musi być większe niż lo")
+    return inv.cache.digest_summary(lo, hi, max(2, min(parts, 256)))
+
+@router.get("/sync/rows")
+def sync_rows(lo: int, hi: int, inv: Inventory = Depends(get_inventory)):
+    """Wiersze z zakresu id [lo, hi) – pobierane dla zakresów, których skrót się różni."""
+    if hi <= lo:
+        raise HTTPException(status_code=400, detail="hi musi być większe niż lo")
+    return inv.cache.items_in_range(lo, hi)
+
+# --- replikacja między węzłami ---
+class ReplicationBatch(BaseModel):
+    node: str
+    changes: list[dict]
+
+@router.get("/replication/changes")
+def replication_changes(since_seq: int = 0, since_uid: str = "", limit: int = 500,
+                        inv: Inventory = Depends(get_inventory)):
+    """Zmiany tego węzła po kursorze (rseq, uid) – pobiera je sąsiad (pull)."""
+    limit = max(1, min(limit, 5000))
+    changes = inv.db.replication_changes(since_seq, since_uid, limit)
+    return {"node": inv.db.node_id, "changes": changes, "more": len(changes) == limit}
+
+@router.post("/replication/apply")
+async def replication_apply(batch: ReplicationBatch, inv: Inventory = Depends(get_inventory)):
+    """Paczka zmian od sąsiada (push); konflikty rozstrzyga last-writer-wins po wersji wiersza."""
+    for change in batch.changes:
+        if not change.get("uid") or not isinstance(change.get("version"), int):
+            raise HTTPException(status_code=400, detail="Każda zmiana musi mieć uid i version")
+        if not change.get("deleted") and not change.get("name"):
+            raise HTTPException(status_code=400, detail="Zmiana wiersza musi mieć name")
+    result = await inv.executor.run(inv.db.apply_replicated, batch.changes)
+    return {"node": inv.db.node_id, **result}
+
+@router.get("/replication/status")
+def replication_status(inv: Inventory = Depends(get_inventory)):
+    if inv.replicator is None:
+        return {"node": inv.db.node_id, "peers": []}
+    return inv.replicator.status()
+
+# --- lista magazynów ---
+class NewInventory(BaseModel):
+    name: str
+
+@app.get("/inventories")
+def list_inventories():
+    """Magazyny (pliki w data/inventories oraz domyślny) i czy są teraz otwarte."""
+    return registry.names()
+
+@app.post("/inventories", status_code=201)
+async def create_inventory(new: NewInventory):
+    try:
+        if registry.exists(new.name):
+            raise HTTPException(status_code=409, detail="Magazyn już istnieje")
+        await registry.get(new.name, create=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "name": new.name}
+
+@app.get("/debug/traces")
+def debug_traces(recent: int = 20):
+    """
+    Opóźnienia propagacji zmian (ms od żądania/zapisu): commit, dispatch (pętla serwera),
+    sent (wysłane do gniazd) i write_to_visible (potwierdzenia klientów po przeładowaniu).
+    Przy kilku workerach każdy zna tylko swoich klientów.
+    """
+    return tracing.recorder.stats(recent)
+
+@app.get("/admission")
+def admission_stats():
+    """Limity klas żądań, bieżące obciążenie i liczba odrzuceń (429) w tym procesie."""
+    return admission.stats()
 
 @app.get("/ping")
 def ping():
     return {"status": "ok", "message": "pong"}
 
 # --- WebSocket /ws ---
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    clients.append(websocket)
-    print(f"📡  Połączono klienta WebSocket ({len(clients)} aktywnych)")
+async def _send_missed_changes(inv: Inventory, websocket: WebSocket, since: int, protocol: str | None):
+    """Po ponownym połączeniu: jeden RELOAD, jeśli od `since` coś się zmieniło."""
+    # odczyty przez asyncio.to_thread – nie czekają w kolejce inv.executor za wolnymi zapisami
+    current = await asyncio.to_thread(inv.db.last_change_seq)
+    await wire.send(websocket, {"type": "hello", "seq": current}, protocol)
+    if since < 0 or since >= current:
+        return
+    # jak w /changes/wait: przycięty dziennik, zmiana zbiorcza (import, zmiana nazwy kategorii)
+    # albo zbyt wiele zmian -> klient przeładowuje całość
+    full = (await asyncio.to_thread(inv._read_changes, since))["full"]
+    await wire.send(websocket, {"event": "reload", "seq": current, "missed": current - since, "full": full}, protocol)
+
+async def _parse_subscription(inv: Inventory, data: dict) -> Subscription:
+    """
+    {"type": "subscribe", "categories": ["IT", "BHP"], "category_ids": [3], "ranges": [[1, 500]]}
+    – nazwy kategorii ("" = bez kategorii), id kategorii, zakresy id [od, do). Brak filtrów = wszystko.
+    """
+    category_map = await asyncio.to_thread(inv.db._category_map)
+    category_ids = set()
+    for name in data.get("categories") or []:
+        if name == "":
+            category_ids.add(None)
+        elif name in category_map:
+            category_ids.add(category_map[name])
+        else:
+            raise ValueError(f"Nieznana kategoria: {name!r}")
+    for category_id in data.get("category_ids") or []:
+        if category_id is not None and not isinstance(category_id, int):
+            raise ValueError("category_ids musi być listą liczb")
+        category_ids.add(category_id)
+    ranges = data.get("ranges") or []
+    if len(ranges) > MAX_RANGES:
+        raise ValueError(f"Najwyżej {MAX_RANGES} zakresów id")
+    if not all(isinstance(r, list) and len(r) == 2 and all(isinstance(b, int) for b in r) for r in ranges):
+        raise ValueError("ranges musi być listą par [od, do)")
+    return Subscription(category_ids, ranges)
+
+@router.get("/ws/stats")
+def websocket_stats(inv: Inventory = Depends(get_inventory)):
+    """Koszt rozsyłania zmian: faktyczny (z filtrami subskrypcji) i jaki byłby bez filtrów."""
+    subscriptions = inv.subscriptions
+    stats = dict(subscriptions.stats)
+    route_seconds = stats.pop("route_seconds")
+    stats["route_us_per_message"] = round(route_seconds / stats["messages"] * 1e6, 1) if stats["messages"] else 0.0
+    return {"clients": len(inv.clients), "filtered_clients": len(subscriptions.subscriptions), **stats}
+
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, since: int | None = None, client: str | None = None,
+                             inv: Inventory = Depends(get_inventory)):
+    """
+    Kanał zmian magazynu: /ws (domyślny) albo /inventories/{nazwa}/ws.
+    Protokół wybiera klient nagłówkiem Sec-WebSocket-Protocol (logic/wire.py);
+    bez nagłówka – JSON w ramkach tekstowych jak dotąd.
+    """
+    protocol = wire.negotiate(websocket.scope.get("subprotocols"))
+    await websocket.accept(subprotocol=protocol)
+    clients = inv.clients
+    clients[websocket] = protocol
+    # nazwa klienta w statystykach opóźnień (?client=kiosk), domyślnie adres
+    client_name = client or (f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "ws")
+    print(f"📡  Połączono klienta WebSocket [{inv.name}] ({len(clients)} aktywnych)")
 
     try:
+        # klienci bez `since` (np. Flutter) dostają tylko bieżące zdarzenia
+        if since is not None:
+            await _send_missed_changes(inv, websocket, since, protocol)
         while True:
-            # klient może wysyłać drobne ping-i, które ignorujemy
-            await websocket.receive_text()
+            # klient może wysyłać drobne ping-i; na ping aplikacyjny odpowiadamy pong
+            data = await wire.receive(websocket, protocol)
+            if data is None:
+                # ramka innego typu niż w protokole albo nieczytelna treść – połączenie zostaje
+                frames = "binarne" if protocol in wire.BINARY_PROTOCOLS else "tekstowe"
+                detail = f"Nieczytelna wiadomość (protokół {protocol or 'JSON'}, ramki {frames})"
+                await wire.send(websocket, {"type": "error", "detail": detail}, protocol)
+            elif isinstance(data, dict) and data.get("type") == "ping":
+                await wire.send(websocket, {"type": "pong"}, protocol)
+            elif isinstance(data, dict) and data.get("type") == "ack":
+                # klient przeładował widok po RELOAD z tymi śladami
+                traces = data.get("traces")
+                if isinstance(traces, list):
+                    tracing.recorder.record_visible([str(t) for t in traces], client_name)
+            elif isinstance(data, dict) and data.get("type") == "subscribe":
+                # od teraz klient dostaje tylko zmiany pasujące do filtrów
+                try:
+                    subscription = await _parse_subscription(inv, data)
+                except ValueError as e:
+                    await wire.send(websocket, {"type": "error", "detail": str(e)}, protocol)
+                    continue
+                inv.subscriptions.subscribe(websocket, subscription)
+                await wire.send(websocket, {"type": "subscribed", **subscription.describe()}, protocol)
     except WebSocketDisconnect:
-        if websocket in clients:
-            clients.remove(websocket)
-        print(f"❌  Klient rozłączony ({len(clients)} pozostało)")
+        pass
+    finally:
+        # także po innym błędzie – martwe gniazdo nie może zostać na liście odbiorców
+        clients.pop(websocket, None)
+        inv.subscriptions.unsubscribe(websocket)
+        print(f"❌  Klient rozłączony [{inv.name}] ({len(clients)} pozostało)")
+
+app.include_router(router)
+app.include_router(router, prefix="/inventories/{inventory}")
 
 # --- uruchamianie serwera ---
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("wifi_server:app", host="0.0.0.0", port=8000, reload=False)
\ No newline at end of file
+    uvicorn.run("wifi_server:app", host="0.0.0.0", port=SERVER_PORT, reload=False, workers=SERVER_WORKERS,
+                ws_per_message_deflate=WS_COMPRESSION)
\ No newline at end of file